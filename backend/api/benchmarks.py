@@ -0,0 +1,407 @@
+import base64
+import io
+import random
+import statistics
+import time
+from contextlib import contextmanager
+
+from api.management.commands.seed_synthetic import (weighted_sample,
+                                                    zipf_weights)
+from api.matching import get_ingredient_matcher, ingredient_matcher
+from api.metrics import QueryRecorder
+from api.search import recipe_index, search_ingredient_ids, search_recipes
+from api.serializers import RecipeSerializer
+from api.utils import add_ingredients
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from PIL import Image
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+from rest_framework.test import APIClient
+from users.models import User
+
+
+def measure(func, arguments):
+    """
+    Вызывает func для каждого набора аргументов и считает задержки и
+    количество SQL-запросов.
+    """
+    timings, queries = [], []
+    for args in arguments:
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            func(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+        queries.append(len(recorder.queries))
+    timings.sort()
+    return {
+        'runs': len(timings),
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 3),
+        'max_ms': round(timings[-1], 3),
+        'queries_p50': statistics.median(queries),
+        'queries_max': max(queries),
+    }
+
+
+def bench_ingredient_search(repeat):
+    """ Автодополнение по префиксам и подстрокам реальных названий. """
+    names = list(Ingredient.objects.values_list('name', flat=True))
+    queries = []
+    for _ in range(repeat):
+        name = random.choice(names)
+        start = random.randrange(len(name))
+        queries.append(name[start:start + random.randint(1, 4)])
+    return measure(
+        lambda query: search_ingredient_ids(
+            query, settings.INGREDIENT_SEARCH_LIMIT),
+        [(query,) for query in queries]
+    )
+
+
+def bench_recipe_ingredients(repeat, size=30):
+    """
+    Проверка и запись ингредиентов рецепта, как при его создании.
+    Все изменения откатываются по окончании замера.
+    """
+    ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+    with transaction.atomic():
+        author = User.objects.create(
+            username='benchmark', email='benchmark@foodgram.local')
+        recipes = [
+            Recipe.objects.create(author=author, name='benchmark', text='-')
+            for _ in range(repeat)
+        ]
+        serializer = RecipeSerializer()
+
+        def create(recipe):
+            ingredients = [
+                {'id': pk, 'amount': 1}
+                for pk in random.sample(ingredient_ids, size)
+            ]
+            serializer.validate_ingredients(ingredients)
+            add_ingredients(ingredients, recipe)
+
+        try:
+            return measure(create, [(recipe,) for recipe in recipes])
+        finally:
+            transaction.set_rollback(True)
+
+
+@contextmanager
+def synthetic_catalog(size):
+    """
+    Синтетический каталог из size рецептов по 3-12 ингредиентов,
+    популярность которых распределена по Ципфу, как в seed_synthetic.
+    Названия и тексты составлены из слов названий ингредиентов.
+    Создаётся в транзакции и откатывается при выходе.
+    Отдаёт слова, id ингредиентов по убыванию популярности и их
+    накопленные веса.
+    """
+    ingredients = list(Ingredient.objects.values_list('id', 'name'))
+    random.shuffle(ingredients)
+    words = [word for _, name in ingredients for word in name.split()]
+    ingredient_ids = [pk for pk, _ in ingredients]
+    weights = zipf_weights(len(ingredient_ids))
+    with transaction.atomic():
+        author = User.objects.create(
+            username='benchmark', email='benchmark@foodgram.local')
+        Recipe.objects.bulk_create(
+            (Recipe(author=author,
+                    name=' '.join(random.sample(words, 3)),
+                    text=' '.join(random.choices(words, k=30)))
+             for _ in range(size)),
+            batch_size=1000
+        )
+        recipes = Recipe.objects.filter(author=author)
+        IngredientRecipe.objects.bulk_create(
+            (IngredientRecipe(recipe_id=recipe, ingredient_id=ingredient,
+                              amount=1)
+             for recipe in recipes.values_list('id', flat=True).iterator()
+             for ingredient in weighted_sample(
+                 random, ingredient_ids, weights, random.randint(3, 12))),
+            batch_size=5000
+        )
+        recipes.update_search_vector()
+        recipe_index.clear()
+        ingredient_matcher.clear()
+        try:
+            yield words, ingredient_ids, weights
+        finally:
+            transaction.set_rollback(True)
+            recipe_index.clear()
+            ingredient_matcher.clear()
+
+
+def bench_recipe_search(repeat, size=100_000):
+    """ Полнотекстовый поиск по синтетическому каталогу. """
+    def search(query):
+        return list(search_recipes(
+            Recipe.objects.all(), query).values_list('id', flat=True)[:6])
+
+    with synthetic_catalog(size) as (words, _, _):
+        search(words[0])
+        return measure(search, [
+            (' '.join(random.sample(words, random.randint(1, 2))),)
+            for _ in range(repeat)
+        ])
+
+
+def bench_ingredient_match(repeat, size=100_000):
+    """
+    Подбор рецептов по 5-15 имеющимся ингредиентам в синтетическом
+    каталоге; популярные ингредиенты встречаются у пользователей чаще.
+    build_ms - время построения индекса.
+    """
+    def match(ingredients):
+        return get_ingredient_matcher().match(
+            ingredients, settings.INGREDIENT_MATCH_LIMIT)
+
+    with synthetic_catalog(size) as (_, ingredient_ids, weights):
+        start = time.perf_counter()
+        get_ingredient_matcher()
+        build = (time.perf_counter() - start) * 1000
+        result = measure(match, [
+            (weighted_sample(random, ingredient_ids, weights,
+                             random.randint(5, 15)),)
+            for _ in range(repeat)
+        ])
+    return {**result, 'build_ms': round(build, 3)}
+
+
+@contextmanager
+def rolled_back():
+    """ Транзакция, изменения которой откатываются при выходе. """
+    with transaction.atomic():
+        try:
+            yield
+        finally:
+            transaction.set_rollback(True)
+
+
+@contextmanager
+def api_client(user):
+    """
+    Клиент DRF, вызывающий настоящие представления в том же процессе
+    от имени user.
+    """
+    client = APIClient()
+    client.force_authenticate(user)
+    with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        yield client
+
+
+def request(client, method, url, **kwargs):
+    response = getattr(client, method)(url, **kwargs)
+    if response.status_code >= 400:
+        raise CommandError(
+            f'{method.upper()} {url}: {response.status_code}')
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def api_users():
+    """
+    Читатель с подписками и корзиной и самый активный автор.
+    Данные готовит команда seed_synthetic.
+    """
+    reader = User.objects.filter(
+        subscriber__isnull=False, cart_items__isnull=False
+    ).order_by('pk').first()
+    author = User.objects.order_by('-recipes_count', 'pk').first()
+    if reader is None or author is None or not author.recipes_count:
+        raise CommandError(
+            'Недостаточно данных, сначала выполните seed_synthetic.')
+    return reader, author
+
+
+def sample_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (800, 600), (120, 180, 90)).save(buffer, 'JPEG')
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/jpeg;base64,{encoded}'
+
+
+def recipe_payload(ingredient_ids, tag_ids):
+    return {
+        'ingredients': [
+            {'id': pk, 'amount': random.randint(1, 500)}
+            for pk in random.sample(ingredient_ids, random.randint(3, 12))
+        ],
+        'tags': random.sample(tag_ids, min(2, len(tag_ids))),
+        'name': 'Тестовый рецепт',
+        'text': 'Описание приготовления.',
+        'cooking_time': random.randint(5, 120),
+    }
+
+
+def bench_api_recipe_list(repeat):
+    """ Лента рецептов с разными фильтрами, порядком и пагинацией. """
+    reader, author = api_users()
+    slugs = list(Tag.objects.values_list('slug', flat=True))
+    pages = max(Recipe.objects.count() // 6, 1)
+    queries = (
+        lambda: f'page={random.randint(1, min(pages, 50))}',
+        lambda: '&'.join(f'tags={slug}' for slug in random.sample(
+            slugs, min(2, len(slugs)))),
+        lambda: f'author={author.pk}',
+        lambda: 'is_favorited=1',
+        lambda: 'is_in_shopping_cart=1',
+        lambda: 'ordering=popular',
+        lambda: 'pagination=cursor',
+    )
+    with api_client(reader) as client:
+        return measure(
+            lambda url: request(client, 'get', url),
+            [(f'/api/recipes/?{random.choice(queries)()}',)
+             for _ in range(repeat)]
+        )
+
+
+def bench_api_recipe_detail(repeat):
+    reader, _ = api_users()
+    ids = list(Recipe.objects.values_list('id', flat=True))
+    with api_client(reader) as client:
+        return measure(
+            lambda url: request(client, 'get', url),
+            [(f'/api/recipes/{random.choice(ids)}/',) for _ in range(repeat)]
+        )
+
+
+def bench_api_subscriptions(repeat):
+    reader, _ = api_users()
+    with api_client(reader) as client:
+        return measure(
+            lambda url: request(client, 'get', url),
+            [('/api/users/subscriptions/?recipes_limit=3',)] * repeat
+        )
+
+
+def bench_api_ingredient_search(repeat):
+    reader, _ = api_users()
+    names = list(Ingredient.objects.values_list('name', flat=True))
+    with api_client(reader) as client:
+        return measure(
+            lambda query: request(
+                client, 'get', '/api/ingredients/', data={'name': query}),
+            [(random.choice(names)[:random.randint(1, 4)],)
+             for _ in range(repeat)]
+        )
+
+
+def bench_api_recipe_create(repeat):
+    """ Создание рецептов; изменения откатываются. """
+    _, author = api_users()
+    ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+    tag_ids = list(Tag.objects.values_list('id', flat=True))
+    image = sample_image()
+    with rolled_back(), api_client(author) as client:
+        return measure(
+            lambda payload: request(
+                client, 'post', '/api/recipes/', data=payload,
+                format='json'),
+            [({**recipe_payload(ingredient_ids, tag_ids), 'image': image},)
+             for _ in range(repeat)]
+        )
+
+
+def bench_api_recipe_patch(repeat):
+    """ Изменение рецептов автором; изменения откатываются. """
+    _, author = api_users()
+    recipe_ids = list(author.recipes.values_list('id', flat=True))
+    ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+    tag_ids = list(Tag.objects.values_list('id', flat=True))
+    with rolled_back(), api_client(author) as client:
+        return measure(
+            lambda url, payload: request(
+                client, 'patch', url, data=payload, format='json'),
+            [(f'/api/recipes/{random.choice(recipe_ids)}/',
+              recipe_payload(ingredient_ids, tag_ids))
+             for _ in range(repeat)]
+        )
+
+
+def bench_api_shopping_cart_download(repeat):
+    reader, _ = api_users()
+    with api_client(reader) as client:
+        return measure(
+            lambda url: request(client, 'get', url),
+            [(f'/api/recipes/download_shopping_cart/?format={export}',)
+             for export in random.choices(('txt', 'csv', 'pdf'), k=repeat)]
+        )
+
+
+@contextmanager
+def connection_settings(**overrides):
+    """ Временно меняет параметры соединения с основной базой. """
+    saved = {key: connection.settings_dict[key] for key in overrides}
+    connection.settings_dict.update(overrides)
+    try:
+        yield
+    finally:
+        connection.settings_dict.update(saved)
+
+
+def bench_connection(repeat, health_checks, prepare=lambda: None):
+    """
+    Карточки рецептов с прогретым кешем от имени читателя по постоянному
+    соединению; prepare вызывается перед каждым запросом. Проверку
+    соединения выполняет обработчик request_started, как и в работающем
+    сервере. Для замера подключения через пул запустите с
+    DB_HOST=pgbouncer.
+    """
+    reader, _ = api_users()
+    urls = [f'/api/recipes/{pk}/' for pk in
+            Recipe.objects.order_by('pk').values_list('id', flat=True)[:20]]
+
+    def get(url):
+        prepare()
+        request(client, 'get', url)
+
+    overrides = {'CONN_MAX_AGE': None, 'CONN_HEALTH_CHECKS': health_checks,
+                 'CONN_HEALTH_CHECK_INTERVAL': 0}
+    with connection_settings(**overrides), api_client(reader) as client:
+        for url in urls:
+            request(client, 'get', url)
+        return measure(get, [(random.choice(urls),) for _ in range(repeat)])
+
+
+def bench_api_connection_fresh(repeat):
+    """ Новое соединение на каждый запрос, как при CONN_MAX_AGE=0. """
+    return bench_connection(repeat, False, connection.close)
+
+
+def bench_api_connection_persistent(repeat):
+    """ Постоянное соединение без проверки. """
+    return bench_connection(repeat, False)
+
+
+def bench_api_connection_checked(repeat):
+    """
+    Постоянное соединение с проверкой перед каждым запросом: худший
+    случай, когда каждый запрос приходит после простоя дольше
+    CONN_HEALTH_CHECK_INTERVAL.
+    """
+    return bench_connection(repeat, True)
+
+
+SCENARIOS = {
+    'api_connection_checked': bench_api_connection_checked,
+    'api_connection_fresh': bench_api_connection_fresh,
+    'api_connection_persistent': bench_api_connection_persistent,
+    'api_ingredient_search': bench_api_ingredient_search,
+    'api_recipe_create': bench_api_recipe_create,
+    'api_recipe_detail': bench_api_recipe_detail,
+    'api_recipe_list': bench_api_recipe_list,
+    'api_recipe_patch': bench_api_recipe_patch,
+    'api_shopping_cart_download': bench_api_shopping_cart_download,
+    'api_subscriptions': bench_api_subscriptions,
+    'ingredient_match': bench_ingredient_match,
+    'ingredient_search': bench_ingredient_search,
+    'recipe_ingredients': bench_recipe_ingredients,
+    'recipe_search': bench_recipe_search,
+}
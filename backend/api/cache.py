@@ -0,0 +1,188 @@
+import hashlib
+import logging
+import threading
+from urllib.parse import urlencode
+from uuid import uuid4
+
+from api.catalog import ingredient_catalog, tag_catalog
+from api.replicas import primary
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from rest_framework import response, status
+
+RECIPES_GENERATION_KEY = 'recipes:generation'
+
+logger = logging.getLogger(__name__)
+
+
+def recipe_version_key(pk):
+    return f'recipes:version:{pk}'
+
+
+def get_version_map(keys):
+    """
+    Токены версий по ключам за одно обращение к кешу;
+    отсутствующие создаются.
+    """
+    versions = cache.get_many(keys)
+    missing = {key: uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return versions
+
+
+def get_versions(*keys):
+    versions = get_version_map(keys)
+    return ':'.join(versions[key] for key in keys)
+
+
+def recipe_list_cache_key(request):
+    """
+    Ключ страницы ленты: поколение рецептов, версии справочников,
+    хост и нормализованная строка запроса.
+    """
+    params = sorted(
+        (key, value)
+        for key in request.query_params
+        for value in request.query_params.getlist(key)
+        if value != ''
+    )
+    query = hashlib.md5(
+        f'{request.get_host()}?{urlencode(params)}'.encode()).hexdigest()
+    versions = get_versions(
+        RECIPES_GENERATION_KEY,
+        tag_catalog.version_key,
+        ingredient_catalog.version_key,
+    )
+    return f'recipes:list:{versions}:{query}'
+
+
+def recipe_detail_cache_key(request, pk):
+    versions = get_versions(
+        recipe_version_key(pk),
+        tag_catalog.version_key,
+        ingredient_catalog.version_key,
+    )
+    return f'recipes:detail:{pk}:{versions}:{request.get_host()}'
+
+
+def cached_response(key, build):
+    """
+    Отдаёт данные ответа из кеша; при промахе строит ответ и кеширует
+    его, если он успешный.
+    """
+    data = cache.get(key)
+    if data is not None:
+        return response.Response(data)
+    with primary():
+        result = build()
+    if result.status_code == status.HTTP_200_OK:
+        cache.set(key, result.data, settings.RECIPE_CACHE_TIMEOUT)
+    return result
+
+
+def overlay_user_flags(body, recipe):
+    """ Накладывает флаги пользователя из аннотаций на общее тело. """
+    return {
+        **body,
+        'author': {
+            **body['author'],
+            'is_subscribed': recipe.author_is_subscribed,
+        },
+        'is_favorited': recipe.is_favorited,
+        'is_in_shopping_cart': recipe.is_in_shopping_cart,
+    }
+
+
+def recipe_payloads(request, recipes, kind, build):
+    """
+    Тела рецептов общие для всех пользователей и кешируются по версии
+    рецепта; недостающие строит build(ids) одним запросом. Флаги
+    пользователя берутся из аннотаций рецептов страницы.
+    """
+    version_keys = {recipe.pk: recipe_version_key(recipe.pk)
+                    for recipe in recipes}
+    catalog_keys = (tag_catalog.version_key, ingredient_catalog.version_key)
+    versions = get_version_map([*version_keys.values(), *catalog_keys])
+    catalogs = ':'.join(versions[key] for key in catalog_keys)
+    body_keys = {
+        pk: (f'recipes:body:{kind}:{pk}:{versions[key]}:{catalogs}:'
+             f'{request.get_host()}')
+        for pk, key in version_keys.items()
+    }
+    bodies = cache.get_many(body_keys.values())
+    missing = [pk for pk, key in body_keys.items() if key not in bodies]
+    if missing:
+        with primary():
+            built = {body['id']: body for body in build(missing)}
+        fresh = {body_keys[pk]: built[pk] for pk in missing if pk in built}
+        cache.set_many(fresh, settings.RECIPE_CACHE_TIMEOUT)
+        bodies.update(fresh)
+    return [overlay_user_flags(bodies[body_keys[recipe.pk]], recipe)
+            for recipe in recipes if body_keys[recipe.pk] in bodies]
+
+
+def invalidate_recipes(recipe_ids):
+    """
+    После коммита меняет поколение ленты и версии переданных рецептов.
+    """
+    keys = [RECIPES_GENERATION_KEY]
+    keys.extend(recipe_version_key(pk) for pk in recipe_ids)
+    transaction.on_commit(lambda: cache.set_many(
+        {key: uuid4().hex for key in keys}, timeout=None))
+
+
+class VersionedIndex:
+    """
+    Структура в памяти процесса, построенная build() для версии данных
+    version(). При смене версии запросы получают прежнюю структуру, пока
+    новая строится в фоновом потоке; синхронно строится только первая.
+    Внутри транзакции перестройка тоже синхронная: фоновый поток не
+    увидел бы незакоммиченных изменений.
+    """
+
+    def __init__(self, build, version):
+        self.build = build
+        self.version = version
+        self.current = None
+        self.building = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        version = self.version()
+        current = self.current
+        if current is not None and current[0] == version:
+            return current[1]
+        if current is None or connection.in_atomic_block:
+            with self.lock:
+                if self.current is None or self.current[0] != version:
+                    self.current = (version, self.build())
+                return self.current[1]
+        with self.lock:
+            start = self.building is None
+            if start:
+                self.building = version
+        if start:
+            threading.Thread(
+                target=self.refresh, args=(version,), daemon=True).start()
+        return current[1]
+
+    def refresh(self, version):
+        try:
+            index = self.build()
+        except Exception:
+            logger.exception(
+                'Не удалось перестроить индекс %s', self.build.__name__)
+            index = None
+        finally:
+            connections.close_all()
+        with self.lock:
+            if index is not None:
+                self.current = (version, index)
+            self.building = None
+
+    def clear(self):
+        with self.lock:
+            self.current = None
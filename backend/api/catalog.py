@@ -0,0 +1,114 @@
+import json
+import threading
+import time
+from functools import wraps
+from uuid import uuid4
+
+from api.replicas import primary
+from api.serializers import IngredientSerializer, TagSerializer
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import (HttpResponse, HttpResponseNotAllowed,
+                         HttpResponseNotModified)
+from django.utils.http import parse_etags
+from recipes.models import Ingredient, Tag
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+class CatalogSnapshot:
+    """ Снимок справочника для одной версии данных """
+
+    def __init__(self, version, items):
+        self.version = version
+        self.items = items
+        self.by_id = {item['id']: item for item in items}
+        self.etag = f'"{version}"'
+        self.content = render_json(items)
+        self.expires = time.monotonic() + settings.CATALOG_SNAPSHOT_TIMEOUT
+
+    def get(self, pk):
+        return self.by_id.get(int(pk)) if str(pk).isdigit() else None
+
+
+class Catalog:
+    """
+    Справочник, закешированный в памяти процесса.
+    Версия хранится в общем кеше Django и меняется сигналами
+    post_save/post_delete, поэтому все процессы видят изменения.
+    Кроме того, снимок перечитывается из базы не реже чем раз в
+    CATALOG_SNAPSHOT_TIMEOUT секунд и при расхождении получает новую
+    версию: так изменения доходят до процесса, даже если кеш не общий.
+    """
+
+    def __init__(self, model, serializer_class):
+        self.model = model
+        self.serializer_class = serializer_class
+        self.version_key = f'catalog:{model._meta.label_lower}:version'
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def version(self):
+        return cache.get_or_set(
+            self.version_key, lambda: uuid4().hex, timeout=None)
+
+    def snapshot(self):
+        version = self.version()
+        snapshot = self._snapshot
+        if (snapshot is None or snapshot.version != version
+                or snapshot.expires <= time.monotonic()):
+            with self._lock, primary():
+                items = [dict(item) for item in self.serializer_class(
+                    self.model.objects.all(), many=True).data]
+                if (snapshot is not None and snapshot.version == version
+                        and items != snapshot.items):
+                    version = uuid4().hex
+                    cache.set(self.version_key, version, timeout=None)
+                snapshot = CatalogSnapshot(version, items)
+                self._snapshot = snapshot
+        return snapshot
+
+    def invalidate(self, **kwargs):
+        transaction.on_commit(
+            lambda: cache.set(self.version_key, uuid4().hex, timeout=None))
+
+
+tag_catalog = Catalog(Tag, TagSerializer)
+ingredient_catalog = Catalog(Ingredient, IngredientSerializer)
+
+
+def tag_choices():
+    return [(tag['slug'], tag['name'])
+            for tag in tag_catalog.snapshot().items]
+
+
+def render_json(data):
+    return json.dumps(
+        data, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def catalog_response(request, snapshot, data=None):
+    """
+    Ответ с ETag версии справочника; 304, если версия не менялась.
+    Без data отдаётся весь справочник, сериализованный в снимке.
+    """
+    etags = parse_etags(request.headers.get('If-None-Match', ''))
+    if snapshot.etag in etags or '*' in etags:
+        result = HttpResponseNotModified()
+    else:
+        result = HttpResponse(
+            snapshot.content if data is None else render_json(data),
+            content_type='application/json')
+    result['ETag'] = snapshot.etag
+    return result
+
+
+def catalog_view(view):
+    """ Асинхронное представление справочника только для чтения. """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return HttpResponseNotAllowed(SAFE_METHODS)
+        return await view(request, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def shared_cache_check(app_configs, **kwargs):
+    """
+    Версии кешей и закрепление за основной БД работают между процессами
+    только через общий кеш.
+    """
+    if settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES:
+        return []
+    if settings.DATABASE_REPLICAS:
+        return [Error(
+            'Реплики для чтения требуют общего кеша: закрепление '
+            'пользователя за основной базой после записи хранится в кеше, '
+            'и другие процессы его не увидят.',
+            hint='Задайте CACHE_BACKEND=django_redis.cache.RedisCache и '
+                 'CACHE_LOCATION=redis://<хост>:6379/1 или уберите '
+                 'DB_REPLICAS.',
+            id='api.E002',
+        )]
+    return [Warning(
+        'Кеш по умолчанию хранится в памяти процесса: при нескольких '
+        'воркерах изменения рецептов и справочников увидит только '
+        'обработавший их процесс.',
+        hint='Задайте CACHE_BACKEND=django_redis.cache.RedisCache и '
+             'CACHE_LOCATION=redis://<хост>:6379/1.',
+        id='api.W001',
+    )]
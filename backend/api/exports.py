@@ -0,0 +1,87 @@
+import csv
+import io
+
+from django.conf import settings
+from recipes.models import ShoppingCartItem
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+SHOPPING_LIST_TITLE = 'Список покупок:'
+PDF_CHUNK_SIZE = 64 * 1024
+
+
+def shopping_list_rows(user, buffered=False):
+    """
+    Итератор по суммарным количествам ингредиентов из корзины.
+    Строки читаются из базы порциями и не загружаются целиком.
+    С buffered строки читаются сразу: под ASGI потоковый ответ
+    отдаётся из цикла событий, где обращаться к базе нельзя.
+    """
+    rows = ShoppingCartItem.objects.filter(
+        user=user
+    ).values_list(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        'total_amount',
+    ).order_by(
+        'ingredient__name'
+    )
+    return list(rows) if buffered else rows.iterator()
+
+
+def export_txt(rows):
+    yield f'{SHOPPING_LIST_TITLE}\n'
+    for name, unit, amount in rows:
+        yield f'\n{name} - {amount} {unit}'
+
+
+class Echo:
+    """ Буфер, который сразу отдаёт записанную строку. """
+
+    def write(self, value):
+        return value
+
+
+def export_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('Ингредиент', 'Количество', 'Единица измерения'))
+    for name, unit, amount in rows:
+        yield writer.writerow((name, amount, unit))
+
+
+def export_pdf(rows):
+    """
+    В отличие от txt и csv, PDF не потоковый: reportlab собирает документ
+    целиком в памяти (BytesIO) и пишет его только в pdf.save(), поэтому
+    первый байт уходит клиенту после обработки всех строк. Ответ затем
+    отдаётся частями по PDF_CHUNK_SIZE.
+    """
+    font = 'ShoppingListFont'
+    if font not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(font, settings.SHOPPING_LIST_FONT))
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    top, bottom, left, step = A4[1] - 50, 50, 50, 20
+    pdf.setFont(font, 16)
+    pdf.drawString(left, top, SHOPPING_LIST_TITLE)
+    pdf.setFont(font, 12)
+    position = top - 2 * step
+    for name, unit, amount in rows:
+        if position < bottom:
+            pdf.showPage()
+            pdf.setFont(font, 12)
+            position = top
+        pdf.drawString(left, position, f'{name} - {amount} {unit}')
+        position -= step
+    pdf.save()
+    buffer.seek(0)
+    yield from iter(lambda: buffer.read(PDF_CHUNK_SIZE), b'')
+
+
+SHOPPING_LIST_EXPORTERS = {
+    'txt': export_txt,
+    'csv': export_csv,
+    'pdf': export_pdf,
+}
@@ -0,0 +1,111 @@
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, features
+from recipes.models import Recipe
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+DECODE_CHUNK_SIZE = 64 * 1024
+IMAGE_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+RENDITION_FORMAT = 'WEBP' if features.check('webp') else 'JPEG'
+RENDITION_EXT = IMAGE_FORMATS[RENDITION_FORMAT]
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS, thread_name_prefix='renditions')
+
+
+def decode_base64_image(data):
+    """
+    Декодирует data:image/...;base64 порциями во временный файл и
+    проверяет его Pillow. Возвращает имя уже сохранённого файла с тем же
+    содержимым либо новый файл с именем по хешу содержимого.
+    """
+    try:
+        _, encoded = data.split(';base64,', 1)
+    except ValueError:
+        raise serializers.ValidationError('Некорректное изображение.')
+    encoded = ''.join(encoded.split())
+    file = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    digest = hashlib.sha256()
+    try:
+        for start in range(0, len(encoded), DECODE_CHUNK_SIZE):
+            chunk = base64.b64decode(
+                encoded[start:start + DECODE_CHUNK_SIZE], validate=True)
+            digest.update(chunk)
+            file.write(chunk)
+        file.seek(0)
+        with Image.open(file) as image:
+            image.verify()
+            image_format = image.format
+    except (binascii.Error, OSError, SyntaxError):
+        file.close()
+        raise serializers.ValidationError('Некорректное изображение.')
+    if image_format not in IMAGE_FORMATS:
+        file.close()
+        raise serializers.ValidationError(
+            'Неподдерживаемый формат изображения.')
+    file.seek(0)
+    name = f'{digest.hexdigest()}.{IMAGE_FORMATS[image_format]}'
+    stored_name = os.path.join(Recipe.image.field.upload_to, name)
+    if default_storage.exists(stored_name):
+        file.close()
+        return stored_name
+    return File(file, name=name)
+
+
+def rendition_name(name, rendition):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return os.path.join(
+        Recipe.image.field.upload_to, 'renditions',
+        f'{stem}_{rendition}.{RENDITION_EXT}'
+    )
+
+
+def rendition_url(image, rendition):
+    """ URL уменьшенной копии, пока её нет - URL оригинала. """
+    name = rendition_name(image.name, rendition)
+    if default_storage.exists(name):
+        return default_storage.url(name)
+    return image.url
+
+
+def generate_renditions(name):
+    """ Создаёт недостающие уменьшенные копии изображения. """
+    for rendition, size in settings.IMAGE_RENDITIONS.items():
+        target = rendition_name(name, rendition)
+        if default_storage.exists(target):
+            continue
+        with default_storage.open(name, 'rb') as source:
+            with Image.open(source) as image:
+                image.thumbnail(size)
+                if RENDITION_FORMAT == 'JPEG' and image.mode != 'RGB':
+                    image = image.convert('RGB')
+                with tempfile.TemporaryFile() as output:
+                    image.save(output, RENDITION_FORMAT, quality=85)
+                    output.seek(0)
+                    default_storage.save(target, File(output))
+
+
+def _generate_renditions_safely(name):
+    try:
+        generate_renditions(name)
+    except Exception:
+        logger.exception('Не удалось создать копии изображения %s', name)
+
+
+def schedule_renditions(name):
+    """ Ставит создание копий в фоновый пул после коммита транзакции. """
+    transaction.on_commit(
+        lambda: executor.submit(_generate_renditions_safely, name))
@@ -0,0 +1,79 @@
+import json
+import subprocess
+
+from api.benchmarks import SCENARIOS
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+def revision():
+    """ Текущий коммит репозитория, если он доступен. """
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+class Command(BaseCommand):
+    help = 'Замеряет задержки и число SQL-запросов горячих участков API.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'scenarios',
+            nargs='*',
+            help=f'Сценарии для запуска: {", ".join(sorted(SCENARIOS))}. '
+                 'По умолчанию все.',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=200,
+            help='Количество повторов каждого сценария.',
+        )
+        parser.add_argument(
+            '--report',
+            help='Сохранить результаты в JSON-файл.',
+        )
+        parser.add_argument(
+            '--compare',
+            help='JSON-отчёт предыдущего запуска для сравнения.',
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options['scenarios']) - SCENARIOS.keys()
+        if unknown:
+            raise CommandError(
+                f'Неизвестные сценарии: {", ".join(sorted(unknown))}')
+        baseline = {}
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                baseline = json.load(file)['results']
+        results = {}
+        for name in options['scenarios'] or sorted(SCENARIOS):
+            result = SCENARIOS[name](options['repeat'])
+            results[name] = result
+            self.stdout.write(f'{name}: ' + ', '.join(
+                f'{key}={value}' for key, value in result.items()))
+            if name in baseline:
+                self.stdout.write('  ' + ', '.join(
+                    self.compare(key, baseline[name], result)
+                    for key in ('p50_ms', 'p95_ms', 'queries_p50')
+                    if key in baseline[name]
+                ))
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as file:
+                json.dump({
+                    'revision': revision(),
+                    'created': timezone.now().isoformat(),
+                    'repeat': options['repeat'],
+                    'results': results,
+                }, file, ensure_ascii=False, indent=2)
+
+    def compare(self, key, old, new):
+        before, after = old[key], new[key]
+        change = (after - before) / before * 100 if before else 0
+        return f'{key}: {before} -> {after} ({change:+.1f}%)'
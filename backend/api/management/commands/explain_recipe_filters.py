@@ -0,0 +1,48 @@
+from api.filters import RecipeFilter
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from recipes.models import Recipe, Tag
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = ('Выводит планы выполнения запросов RecipeFilter, чтобы '
+            'проверить, что планировщик использует индексы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            help='id пользователя для фильтров избранного и корзины.',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['user']:
+            users = users.filter(pk=options['user'])
+        user = users.filter(favorites__isnull=False).first() or users.first()
+        if user is None:
+            raise CommandError('Пользователь не найден.')
+        author = Recipe.objects.values_list('author', flat=True).first()
+        slugs = list(Tag.objects.values_list('slug', flat=True)[:2])
+        shapes = {
+            'лента': {},
+            'автор': {'author': author},
+            'теги': {'tags': slugs},
+            'избранное': {'is_favorited': 1},
+            'корзина': {'is_in_shopping_cart': 1},
+            'автор и теги': {'author': author, 'tags': slugs},
+            'популярные': {'ordering': 'popular'},
+            'в тренде': {'ordering': 'trending'},
+        }
+        factory = RequestFactory()
+        for title, params in shapes.items():
+            request = factory.get('/api/recipes/', params)
+            request.user = user
+            queryset = RecipeFilter(
+                params,
+                queryset=Recipe.objects.with_user_flags(user),
+                request=request,
+            ).qs[:6]
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            self.stdout.write(queryset.explain())
@@ -0,0 +1,24 @@
+from api.images import generate_renditions
+from django.core.management.base import BaseCommand
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создаёт недостающие уменьшенные копии изображений рецептов.'
+
+    def handle(self, *args, **options):
+        names = Recipe.objects.exclude(
+            image=''
+        ).exclude(
+            image__isnull=True
+        ).values_list('image', flat=True).order_by().distinct()
+        count = 0
+        for name in names.iterator():
+            try:
+                generate_renditions(name)
+            except OSError as error:
+                self.stderr.write(f'{name}: {error}')
+                continue
+            count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {count}'))
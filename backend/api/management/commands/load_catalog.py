@@ -0,0 +1,85 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from api.catalog import ingredient_catalog
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.models import Ingredient
+
+DEFAULT_PATH = os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv')
+
+
+def read_csv(path):
+    with open(path, encoding='utf-8', newline='') as file:
+        for row in csv.reader(file):
+            if len(row) >= 2:
+                yield row[0], row[1]
+
+
+def read_json(path):
+    with open(path, encoding='utf-8') as file:
+        for item in json.load(file):
+            yield item['name'], item['measurement_unit']
+
+
+READERS = {'.csv': read_csv, '.json': read_json}
+
+
+class Command(BaseCommand):
+    help = ('Загружает ингредиенты из CSV (название,единица) или JSON '
+            'пачками, пропуская уже существующие. Повторный запуск '
+            'ничего не меняет.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='*',
+            help=f'Файлы .csv или .json, по умолчанию {DEFAULT_PATH}.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество строк в одной вставке.',
+        )
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or [DEFAULT_PATH]
+        for path in paths:
+            if os.path.splitext(path)[1] not in READERS:
+                raise CommandError(f'Неподдерживаемый формат файла: {path}')
+            if not os.path.exists(path):
+                raise CommandError(f'Файл не найден: {path}')
+        start = time.perf_counter()
+        seen = set(Ingredient.objects.values_list(
+            'name', 'measurement_unit').iterator())
+        read = created = 0
+        with transaction.atomic():
+            for path in paths:
+                rows = READERS[os.path.splitext(path)[1]](path)
+                while True:
+                    batch = list(islice(rows, options['batch_size']))
+                    if not batch:
+                        break
+                    read += len(batch)
+                    new = []
+                    for name, unit in batch:
+                        key = (name.strip(), unit.strip())
+                        if key[0] and key not in seen:
+                            seen.add(key)
+                            new.append(Ingredient(
+                                name=key[0], measurement_unit=key[1]))
+                    Ingredient.objects.bulk_create(new)
+                    created += len(new)
+            if created:
+                ingredient_catalog.invalidate()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано строк: {read}, добавлено: {created}, '
+            f'пропущено: {read - created} за {elapsed:.2f} с '
+            f'({read / elapsed:.0f} строк/с)'
+        ))
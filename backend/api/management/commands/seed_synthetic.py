@@ -0,0 +1,179 @@
+import hashlib
+import io
+import os
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate
+from uuid import uuid4
+
+from api.images import generate_renditions
+from api.management.commands.snapshot import (muted_signals, raw_dates,
+                                              rebuild_derived_data)
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Subscribe, User
+
+ZIPF_EXPONENT = 1.1
+
+
+def zipf_weights(size):
+    """ Накопленные веса закона Ципфа: немногие элементы популярны. """
+    return list(accumulate(
+        1 / (rank + 1) ** ZIPF_EXPONENT for rank in range(size)))
+
+
+def weighted_sample(rng, population, cum_weights, size):
+    """ До size разных элементов population с учётом весов. """
+    chosen = dict.fromkeys(
+        rng.choices(population, cum_weights=cum_weights, k=size * 2))
+    return list(chosen)[:size]
+
+
+def placeholder_image():
+    """ Общее изображение синтетических рецептов с копиями. """
+    buffer = io.BytesIO()
+    Image.new('RGB', (1200, 800), (214, 160, 96)).save(buffer, 'JPEG')
+    content = buffer.getvalue()
+    name = os.path.join(Recipe.image.field.upload_to,
+                        f'{hashlib.sha256(content).hexdigest()}.jpg')
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(content))
+        generate_renditions(name)
+    return name
+
+
+class Command(BaseCommand):
+    help = ('Создаёт синтетических пользователей, рецепты, избранное, '
+            'корзины и подписки массовыми вставками. Популярность '
+            'ингредиентов, авторов и рецептов распределена по Ципфу.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument(
+            '--favorites', type=int, default=20,
+            help='Избранных рецептов на пользователя.')
+        parser.add_argument(
+            '--carts', type=int, default=3,
+            help='Рецептов в корзине на пользователя.')
+        parser.add_argument(
+            '--subscriptions', type=int, default=5,
+            help='Подписок на пользователя.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь.')
+        if not Ingredient.objects.exists():
+            call_command('load_catalog', stdout=self.stdout)
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.ingredients = list(
+            Ingredient.objects.values_list('id', 'name'))
+        self.rng.shuffle(self.ingredients)
+        self.tags = list(Tag.objects.values_list('id', flat=True))
+        if not self.tags:
+            raise CommandError('Нет тегов, примените миграции.')
+        start = time.perf_counter()
+        with transaction.atomic():
+            with muted_signals(), raw_dates():
+                users = self.create_users(options['users'])
+                recipes = self.create_recipes(users, options['recipes'])
+                self.create_links(users, recipes, options)
+            rebuild_derived_data()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей: {len(users)}, рецептов: {len(recipes)} '
+            f'за {time.perf_counter() - start:.2f} с'
+        ))
+
+    def create_users(self, count):
+        prefix = f'synthetic_{uuid4().hex[:8]}'
+        password = make_password(None)
+        User.objects.bulk_create(
+            (User(username=f'{prefix}_{number}',
+                  email=f'{prefix}_{number}@foodgram.local',
+                  first_name='Synthetic', last_name=str(number),
+                  password=password)
+             for number in range(count)),
+            batch_size=self.batch_size
+        )
+        return list(User.objects.filter(
+            username__startswith=prefix).values_list('id', flat=True))
+
+    def create_recipes(self, users, count):
+        image = placeholder_image()
+        authors = zipf_weights(len(users))
+        now = timezone.now()
+        words = [word for _, name in self.ingredients for word in name.split()]
+        Recipe.objects.bulk_create(
+            (Recipe(author_id=self.rng.choices(users, cum_weights=authors)[0],
+                    name=' '.join(self.rng.sample(words, 3)).capitalize(),
+                    text=' '.join(self.rng.choices(words, k=60)),
+                    image=image,
+                    cooking_time=self.rng.randint(5, 180),
+                    pub_date=now - timedelta(
+                        minutes=self.rng.randint(0, 365 * 24 * 60)))
+             for _ in range(count)),
+            batch_size=self.batch_size
+        )
+        recipes = list(Recipe.objects.filter(
+            author__in=users).values_list('id', flat=True))
+        ids = [pk for pk, _ in self.ingredients]
+        weights = zipf_weights(len(ids))
+        IngredientRecipe.objects.bulk_create(
+            (IngredientRecipe(recipe_id=recipe, ingredient_id=ingredient,
+                              amount=self.rng.randint(1, 500))
+             for recipe in recipes
+             for ingredient in weighted_sample(
+                 self.rng, ids, weights, self.rng.randint(3, 12))),
+            batch_size=self.batch_size
+        )
+        Recipe.tags.through.objects.bulk_create(
+            (Recipe.tags.through(recipe_id=recipe, tag_id=tag)
+             for recipe in recipes
+             for tag in self.rng.sample(
+                 self.tags, self.rng.randint(1, min(3, len(self.tags))))),
+            batch_size=self.batch_size
+        )
+        return recipes
+
+    def create_links(self, users, recipes, options):
+        if not recipes:
+            return
+        popularity = list(recipes)
+        self.rng.shuffle(popularity)
+        weights = zipf_weights(len(popularity))
+        authors = zipf_weights(len(users))
+        now = timezone.now()
+        published = dict(Recipe.objects.filter(
+            pk__in=recipes).values_list('id', 'pub_date'))
+        for model, per_user in ((Favorite, options['favorites']),
+                                (ShoppingCart, options['carts'])):
+            model.objects.bulk_create(
+                (model(user_id=user, recipe_id=recipe,
+                       created=published[recipe] + self.rng.random() * (
+                           now - published[recipe]))
+                 for user in users
+                 for recipe in weighted_sample(
+                     self.rng, popularity, weights,
+                     min(per_user, len(recipes)))),
+                batch_size=self.batch_size
+            )
+        Subscribe.objects.bulk_create(
+            (Subscribe(user_id=user, author_id=author)
+             for user in users
+             for author in weighted_sample(
+                 self.rng, users, authors, options['subscriptions'])
+             if author != user),
+            batch_size=self.batch_size
+        )
@@ -0,0 +1,273 @@
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from io import StringIO
+
+from api.cache import invalidate_recipes
+from api.catalog import ingredient_catalog, tag_catalog
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import signals
+from django.utils import timezone
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Subscribe, User
+
+MODELS = (
+    User, Tag, Ingredient, Recipe, IngredientRecipe,
+    Favorite, ShoppingCart, Subscribe,
+)
+SKIPPED_FIELDS = {'search_vector'}
+READ_BLOCK_SIZE = 64 * 1024
+
+
+def concrete_fields(model):
+    return [field for field in model._meta.concrete_fields
+            if not field.primary_key and field.name not in SKIPPED_FIELDS]
+
+
+def m2m_fields(model):
+    """ Связи многие-ко-многим без своей промежуточной модели. """
+    return [field for field in model._meta.many_to_many
+            if field.remote_field.through._meta.auto_created]
+
+
+def m2m_values(field, pks):
+    through = field.remote_field.through
+    source = field.m2m_field_name()
+    target = field.m2m_reverse_field_name()
+    values = defaultdict(list)
+    for pk, value in through.objects.filter(
+            **{f'{source}__in': pks}).values_list(source, target):
+        values[pk].append(value)
+    return values
+
+
+def export_objects(model, chunk_size):
+    """ Объекты модели в формате фикстуры порциями по возрастанию pk. """
+    fields = concrete_fields(model)
+    many_to_many = m2m_fields(model)
+    queryset = model._base_manager.order_by('pk').values_list(
+        'pk', *(field.attname for field in fields))
+    last = None
+    while True:
+        chunk = queryset if last is None else queryset.filter(pk__gt=last)
+        rows = list(chunk[:chunk_size])
+        if not rows:
+            return
+        last = rows[-1][0]
+        related = {field.name: m2m_values(field, [row[0] for row in rows])
+                   for field in many_to_many}
+        for pk, *values in rows:
+            data = {field.name: value for field, value in zip(fields, values)}
+            for name, items in related.items():
+                data[name] = items.get(pk, [])
+            yield {'model': model._meta.label_lower, 'pk': pk,
+                   'fields': data}
+
+
+def read_fixture(path):
+    """ Потоково читает объекты JSON-массива фикстуры. """
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8') as file:
+        buffer, eof = '', False
+        while True:
+            buffer = buffer.lstrip(' \t\r\n[,')
+            if buffer.startswith(']') or (eof and not buffer):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise CommandError(f'Некорректный JSON в файле {path}')
+                block = file.read(READ_BLOCK_SIZE)
+                eof = not block
+                buffer += block
+                continue
+            buffer = buffer[end:]
+            yield item
+
+
+@contextmanager
+def muted_signals():
+    """ Отключает обработчики сигналов моделей на время загрузки. """
+    muted = (signals.pre_save, signals.post_save, signals.pre_delete,
+             signals.post_delete, signals.m2m_changed)
+    saved = [signal.receivers for signal in muted]
+    for signal in muted:
+        with signal.lock:
+            signal.receivers = []
+            signal.sender_receivers_cache.clear()
+    try:
+        yield
+    finally:
+        for signal, receivers in zip(muted, saved):
+            with signal.lock:
+                signal.receivers = receivers
+                signal.sender_receivers_cache.clear()
+
+
+@contextmanager
+def raw_dates():
+    """
+    Отключает auto_now и auto_now_add, чтобы даты из снимка
+    сохранились как есть.
+    """
+    fields = [field for model in MODELS for field in concrete_fields(model)
+              if getattr(field, 'auto_now_add', False)
+              or getattr(field, 'auto_now', False)]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def rebuild_derived_data():
+    """
+    Пересчитывает счётчики, корзины, рейтинги и поисковые векторы после
+    массовой вставки и сбрасывает версии кешей.
+    """
+    for command in ('reconcile_counters', 'rebuild_shopping_cart',
+                    'update_recipe_scores'):
+        call_command(command, stdout=StringIO())
+    Recipe.objects.update_search_vector()
+    tag_catalog.invalidate()
+    ingredient_catalog.invalidate()
+    invalidate_recipes([])
+
+
+class Loader:
+    """
+    Копит объекты снимка и вставляет их пачками через bulk_create.
+    Даты auto_now_add, которых нет в снимках старых версий, получают
+    время загрузки.
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.models = {model._meta.label_lower: model for model in MODELS}
+        self.fields = {
+            model: {field.name: field for field in
+                    concrete_fields(model) + m2m_fields(model)}
+            for model in MODELS
+        }
+        self.loaded_at = timezone.now()
+        self.dates = {
+            model: [field for field in concrete_fields(model)
+                    if getattr(field, 'auto_now_add', False)]
+            for model in MODELS
+        }
+        self.pending = defaultdict(list)
+        self.counts = defaultdict(int)
+        self.skipped = 0
+
+    def add(self, item):
+        model = self.models.get(item.get('model'))
+        if model is None:
+            self.skipped += 1
+            return
+        instance = model(pk=item['pk'])
+        links = []
+        for name, value in item['fields'].items():
+            field = self.fields[model].get(name)
+            if field is None:
+                continue
+            if field.many_to_many:
+                links.append((field, value))
+            elif field.is_relation:
+                setattr(instance, field.attname, value)
+            else:
+                setattr(instance, field.attname, field.to_python(value))
+        for field in self.dates[model]:
+            if getattr(instance, field.attname) is None:
+                setattr(instance, field.attname, self.loaded_at)
+        self.append(model, instance)
+        for field, values in links:
+            through = field.remote_field.through
+            source = f'{field.m2m_field_name()}_id'
+            target = f'{field.m2m_reverse_field_name()}_id'
+            for value in values:
+                self.append(through, through(
+                    **{source: instance.pk, target: value}))
+
+    def append(self, model, instance):
+        pending = self.pending[model]
+        pending.append(instance)
+        if len(pending) >= self.batch_size:
+            self.flush(model)
+
+    def flush(self, model):
+        pending = self.pending.pop(model, [])
+        self.counts[model._meta.label] += len(pending)
+        model.objects.bulk_create(pending)
+
+    def finish(self):
+        for model in list(self.pending):
+            self.flush(model)
+
+
+class Command(BaseCommand):
+    help = ('Быстрая выгрузка и загрузка данных пользователей и рецептов '
+            'в формате фикстур Django. Загрузка заменяет существующие '
+            'данные этих моделей в одной транзакции.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=('export', 'import'))
+        parser.add_argument('path', help='Файл снимка (JSON).')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Размер порции при чтении и вставке.',
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options['action'] == 'export':
+            total = self.export(options['path'], options['batch_size'])
+        else:
+            total = self.load(options['path'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Объектов: {total} за {time.perf_counter() - start:.2f} с'))
+
+    def export(self, path, batch_size):
+        total = 0
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('[')
+            for model in MODELS:
+                for item in export_objects(model, batch_size):
+                    file.write(',\n' if total else '\n')
+                    file.write(json.dumps(
+                        item, cls=DjangoJSONEncoder, ensure_ascii=False))
+                    total += 1
+            file.write('\n]\n')
+        return total
+
+    def load(self, path, batch_size):
+        loader = Loader(batch_size)
+        with transaction.atomic():
+            with muted_signals(), raw_dates():
+                for model in reversed(MODELS):
+                    model.objects.all().delete()
+                for item in read_fixture(path):
+                    loader.add(item)
+                loader.finish()
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(
+                        no_style(), MODELS):
+                    cursor.execute(sql)
+            rebuild_derived_data()
+        for label, count in sorted(loader.counts.items()):
+            self.stdout.write(f'{label}: {count}')
+        if loader.skipped:
+            self.stdout.write(f'Пропущено объектов других моделей: '
+                              f'{loader.skipped}')
+        return sum(loader.counts.values())
@@ -0,0 +1,94 @@
+from array import array
+
+import numpy as np
+from api.cache import RECIPES_GENERATION_KEY, VersionedIndex, get_versions
+from api.replicas import primary
+from recipes.models import IngredientRecipe
+
+
+def group_by(keys, values):
+    """
+    Значения, сгруппированные по ключам в формате CSR: уникальные ключи,
+    границы групп и значения, упорядоченные по ключу.
+    """
+    order = np.argsort(keys, kind='stable')
+    keys, values = keys[order], values[order]
+    unique, starts = np.unique(keys, return_index=True)
+    return unique, np.append(starts, len(keys)), values
+
+
+class IngredientMatcher:
+    """
+    Обратный индекс ингредиент -> рецепты в памяти процесса в массивах
+    numpy. Совпадения по всему каталогу считаются одним np.bincount по
+    спискам рецептов имеющихся ингредиентов, без запросов к базе.
+    """
+
+    def __init__(self, rows):
+        recipe_column, ingredient_column = array('q'), array('q')
+        for recipe, ingredient in rows:
+            recipe_column.append(recipe)
+            ingredient_column.append(ingredient)
+        recipes = np.frombuffer(recipe_column, dtype=np.int64)
+        ingredients = np.frombuffer(ingredient_column, dtype=np.int64)
+        self.recipe_ids, positions = np.unique(recipes, return_inverse=True)
+        positions = positions.astype(np.int32)
+        self.sizes = np.bincount(positions, minlength=len(self.recipe_ids))
+        self.ingredient_ids, self.postings_bounds, self.postings = group_by(
+            ingredients, positions)
+        _, self.recipe_bounds, self.recipe_ingredients = group_by(
+            positions, ingredients)
+
+    def match(self, ingredient_ids, limit):
+        """
+        До limit рецептов с наибольшей долей имеющихся ингредиентов:
+        список (id рецепта, доля, id недостающих ингредиентов).
+        """
+        have = np.unique(np.asarray(list(ingredient_ids), dtype=np.int64))
+        found = np.searchsorted(self.ingredient_ids, have)
+        found = found[found < len(self.ingredient_ids)]
+        found = found[np.isin(self.ingredient_ids[found], have)]
+        if not len(found) or not limit:
+            return []
+        counts = np.bincount(
+            np.concatenate([
+                self.postings[self.postings_bounds[index]:
+                              self.postings_bounds[index + 1]]
+                for index in found
+            ]),
+            minlength=len(self.recipe_ids)
+        )
+        candidates = np.flatnonzero(counts)
+        scores = counts[candidates] / self.sizes[candidates]
+        if len(candidates) > limit:
+            threshold = np.partition(scores, -limit)[-limit]
+            keep = scores >= threshold
+            candidates, scores = candidates[keep], scores[keep]
+        order = np.lexsort(
+            (-self.recipe_ids[candidates], -counts[candidates], -scores)
+        )[:limit]
+        return [
+            (int(self.recipe_ids[position]), float(scores[index]),
+             self.missing(position, have))
+            for index, position in ((index, candidates[index])
+                                    for index in order)
+        ]
+
+    def missing(self, position, have):
+        ingredients = self.recipe_ingredients[
+            self.recipe_bounds[position]:self.recipe_bounds[position + 1]]
+        return ingredients[~np.isin(ingredients, have)].tolist()
+
+
+def build_ingredient_matcher():
+    with primary():
+        return IngredientMatcher(IngredientRecipe.objects.values_list(
+            'recipe', 'ingredient').iterator())
+
+
+ingredient_matcher = VersionedIndex(
+    build_ingredient_matcher, lambda: get_versions(RECIPES_GENERATION_KEY))
+
+
+def get_ingredient_matcher():
+    return ingredient_matcher.get()
@@ -0,0 +1,179 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+TOP_FINGERPRINTS = 5
+
+current_recorder = ContextVar('current_recorder', default=None)
+
+
+def fingerprint(sql):
+    """ Текст запроса без литералов и с одинаковыми списками IN. """
+    sql = STRING_LITERAL.sub('?', sql)
+    sql = NUMBER_LITERAL.sub('?', sql)
+    return PLACEHOLDER_LIST.sub('(...)', sql)
+
+
+class QueryRecorder:
+    """ Обёртка connection.execute_wrapper, запоминающая SQL и время. """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+
+def record_queries(execute, sql, params, many, context):
+    """
+    Передаёт запрос QueryRecorder текущего HTTP-запроса. Переменная
+    контекста доступна и в потоках sync_to_async асинхронных представлений.
+    """
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """ Подключает record_queries к новому соединению с базой. """
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_queries)
+
+
+class EndpointStats:
+    """ Накопленные показатели одного представления и действия. """
+
+    def __init__(self, buckets):
+        self.buckets = [0] * len(buckets)
+        self.count = 0
+        self.duration = 0.0
+        self.queries = 0
+        self.sql_duration = 0.0
+        self.duplicates = 0
+        self.fingerprints = Counter()
+
+
+class MetricsRegistry:
+    """
+    Метрики запросов в памяти процесса. Каждый воркер отдаёт
+    собственные значения, Prometheus суммирует их по instance.
+    """
+
+    def __init__(self, buckets):
+        self.bucket_bounds = tuple(buckets)
+        self.endpoints = defaultdict(lambda: EndpointStats(self.bucket_bounds))
+        self.lock = threading.Lock()
+
+    def observe(self, endpoint, duration, queries):
+        fingerprints = Counter(fingerprint(sql) for sql, _ in queries)
+        duplicates = Counter({
+            sql: count - 1 for sql, count in fingerprints.items()
+            if count > 1
+        })
+        with self.lock:
+            stats = self.endpoints[endpoint]
+            position = bisect_left(self.bucket_bounds, duration)
+            if position < len(stats.buckets):
+                stats.buckets[position] += 1
+            stats.count += 1
+            stats.duration += duration
+            stats.queries += len(queries)
+            stats.sql_duration += sum(elapsed for _, elapsed in queries)
+            stats.duplicates += sum(duplicates.values())
+            stats.fingerprints.update(duplicates)
+
+    def render(self):
+        """ Метрики в текстовом формате Prometheus. """
+        with self.lock:
+            endpoints = sorted(self.endpoints.items())
+            lines = [
+                '# HELP foodgram_request_duration_seconds '
+                'Время обработки запроса.',
+                '# TYPE foodgram_request_duration_seconds histogram',
+            ]
+            for endpoint, stats in endpoints:
+                label = f'endpoint="{escape(endpoint)}"'
+                cumulative = 0
+                for bound, count in zip(self.bucket_bounds, stats.buckets):
+                    cumulative += count
+                    lines.append(
+                        'foodgram_request_duration_seconds_bucket'
+                        f'{{{label},le="{bound}"}} {cumulative}')
+                lines.extend((
+                    'foodgram_request_duration_seconds_bucket'
+                    f'{{{label},le="+Inf"}} {stats.count}',
+                    'foodgram_request_duration_seconds_sum'
+                    f'{{{label}}} {stats.duration}',
+                    'foodgram_request_duration_seconds_count'
+                    f'{{{label}}} {stats.count}',
+                ))
+            for name, attribute, description in COUNTERS:
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} counter')
+                lines.extend(
+                    f'{name}{{endpoint="{escape(endpoint)}"}} '
+                    f'{getattr(stats, attribute)}'
+                    for endpoint, stats in endpoints
+                )
+            lines.append('# HELP foodgram_sql_duplicate_fingerprint_total '
+                         'Самые частые повторы одного запроса (N+1).')
+            lines.append('# TYPE foodgram_sql_duplicate_fingerprint_total '
+                         'counter')
+            for endpoint, stats in endpoints:
+                for sql, count in stats.fingerprints.most_common(
+                        TOP_FINGERPRINTS):
+                    lines.append(
+                        'foodgram_sql_duplicate_fingerprint_total'
+                        f'{{endpoint="{escape(endpoint)}",'
+                        f'fingerprint="{escape(sql[:200])}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+COUNTERS = (
+    ('foodgram_sql_queries_total', 'queries', 'Количество SQL-запросов.'),
+    ('foodgram_sql_duration_seconds_total', 'sql_duration',
+     'Суммарное время SQL-запросов.'),
+    ('foodgram_sql_duplicate_queries_total', 'duplicates',
+     'Повторы запросов с одинаковым отпечатком.'),
+)
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace(
+        '\n', ' ')
+
+
+registry = MetricsRegistry(settings.METRICS_BUCKETS)
+
+
+def metrics_view(request):
+    """
+    Метрики для Prometheus. Если задан METRICS_TOKEN, нужен заголовок
+    Authorization: Bearer <токен>, иначе доступ только у персонала.
+    """
+    if settings.METRICS_TOKEN:
+        allowed = constant_time_compare(
+            request.headers.get('Authorization', ''),
+            f'Bearer {settings.METRICS_TOKEN}'
+        )
+    else:
+        allowed = request.user.is_staff
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.render(), content_type='text/plain; version=0.0.4')
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import time
+
+from api.metrics import QueryRecorder, current_recorder, registry
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def endpoint_name(request):
+    """ Представление и действие вьюсета, например RecipeViewSet.list. """
+    match = request.resolver_match
+    if match is None:
+        return 'unresolved'
+    view = getattr(match.func, 'cls', None)
+    if view is None:
+        return match.view_name or match.func.__name__
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{view.__name__}.{action}'
+
+
+class MetricsMiddleware:
+    """
+    Считает для каждого представления время ответа, количество и время
+    SQL-запросов и повторяющиеся запросы; медленные запросы пишет в лог.
+    Поддерживает и синхронный (WSGI), и асинхронный (ASGI) режим.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        token = current_recorder.set(recorder)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.process_response(request, response, recorder, start)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        token = current_recorder.set(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.process_response(request, response, recorder, start)
+
+    def process_response(self, request, response, recorder, start):
+        if response.streaming:
+            response.streaming_content = self.stream(
+                request, response.streaming_content, recorder, start)
+        else:
+            self.finish(request, recorder, start)
+        return response
+
+    def stream(self, request, content, recorder, start):
+        """ Время ответа учитывает отдачу потокового содержимого. """
+        try:
+            yield from content
+        finally:
+            self.finish(request, recorder, start)
+
+    def finish(self, request, recorder, start):
+        duration = time.perf_counter() - start
+        endpoint = endpoint_name(request)
+        registry.observe(endpoint, duration, recorder.queries)
+        if (settings.SLOW_REQUEST_MS
+                and duration * 1000 >= settings.SLOW_REQUEST_MS):
+            slowest = sorted(
+                recorder.queries, key=lambda query: query[1], reverse=True)
+            logger.warning(
+                'Медленный запрос %s %s (%s): %.0f мс, SQL: %s за %.0f мс\n%s',
+                request.method, request.path, endpoint, duration * 1000,
+                len(recorder.queries),
+                sum(elapsed for _, elapsed in recorder.queries) * 1000,
+                '\n'.join(f'{elapsed * 1000:.1f} мс: {sql}'
+                          for sql, elapsed in slowest[:5])
+            )
@@ -1,7 +1,65 @@
-from rest_framework.pagination import PageNumberPagination
+from collections import OrderedDict
+
+from recipes.models import RECIPE_ORDERINGS
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
 
 
 class RecipePagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
     max_page_size = page_size
+
+
+class RecipeCursorPagination(CursorPagination):
+    """
+    Пагинация по курсору без OFFSET и без COUNT(*).
+    Количество считается только по запросу ?count=1; порядок, заданный
+    фильтрами (ordering, search), сохраняется.
+    """
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = page_size
+    ordering = RECIPE_ORDERINGS['new']
+    count_query_param = 'count'
+
+    def get_ordering(self, request, queryset, view):
+        if queryset.query.order_by:
+            return tuple(queryset.query.order_by)
+        return self.ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count = queryset.count()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+class SubscriptionCursorPagination(RecipeCursorPagination):
+    ordering = ('username', )
+
+
+class OptionalCursorPaginationMixin:
+    """
+    Включает пагинацию по курсору, если запрошено ?pagination=cursor
+    или передан cursor; иначе остаётся постраничная пагинация.
+    """
+    cursor_pagination_class = RecipeCursorPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if 'cursor' in params or params.get('pagination') == 'cursor':
+                self._paginator = self.cursor_pagination_class()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
@@ -0,0 +1,102 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+read_database = ContextVar('read_database', default=None)
+
+
+def choose_replica():
+    """ Случайная реплика или None, если реплики не настроены. """
+    if not settings.DATABASE_REPLICAS:
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+@contextmanager
+def reading_from(alias):
+    """ Направляет чтения внутри блока в базу alias (None - основная). """
+    token = read_database.set(alias)
+    try:
+        yield
+    finally:
+        read_database.reset(token)
+
+
+def primary():
+    """
+    Чтение из основной базы. Нужно для данных, которые кешируются по
+    версии: отставшая реплика закрепила бы устаревшие данные под новой
+    версией.
+    """
+    return reading_from(None)
+
+
+def replica():
+    return reading_from(choose_replica())
+
+
+def pin_key(user):
+    return f'replicas:pin:{user.pk}'
+
+
+def pin_to_primary(user):
+    """
+    Чтения пользователя идут в основную базу REPLICA_PIN_SECONDS.
+    Закрепление хранится в общем кеше (проверка api.E002), чтобы его
+    видели все процессы.
+    """
+    cache.set(pin_key(user), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user):
+    return user.is_authenticated and cache.get(pin_key(user), False)
+
+
+class ReplicaRouter:
+    """
+    Запись и миграции только в основную базу. Чтение идёт в реплику,
+    если её выбрал ReplicaReadMixin или блок replica().
+    """
+
+    def db_for_read(self, model, **hints):
+        return read_database.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReplicaReadMixin:
+    """
+    Безопасные запросы вьюсета читают из реплики. После успешного
+    изменяющего запроса пользователь на время закрепляется за основной
+    базой, чтобы сразу видеть свои изменения.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with primary():
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (settings.DATABASE_REPLICAS
+                and request.method in SAFE_METHODS
+                and not is_pinned(request.user)):
+            read_database.set(choose_replica())
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if (settings.DATABASE_REPLICAS
+                and request.method not in SAFE_METHODS
+                and response.status_code < 400
+                and request.user.is_authenticated):
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,176 @@
+import heapq
+import math
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from functools import lru_cache
+
+from api.cache import RECIPES_GENERATION_KEY, VersionedIndex, get_versions
+from api.catalog import ingredient_catalog
+from api.replicas import primary
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import Case, F, FloatField, IntegerField, Value, When
+from recipes.models import Ingredient, IngredientRecipe, Recipe
+
+STEM_LENGTH = 5
+
+
+class IngredientIndex:
+    """
+    Отсортированный индекс названий ингредиентов в памяти процесса.
+    Используется вместо trigram-индекса, когда база не PostgreSQL.
+    """
+
+    def __init__(self, ingredients):
+        self.entries = sorted(
+            (name.lower(), pk) for pk, name in ingredients)
+        self.names = [name for name, _ in self.entries]
+
+    def search(self, query, limit):
+        query = query.lower()
+        found = []
+        position = bisect_left(self.names, query)
+        while (position < len(self.names) and len(found) < limit
+               and self.names[position].startswith(query)):
+            found.append(self.entries[position][1])
+            position += 1
+        for name, pk in self.entries:
+            if len(found) >= limit:
+                break
+            if query in name and not name.startswith(query):
+                found.append(pk)
+        return found
+
+
+@lru_cache(maxsize=1)
+def build_ingredient_index(snapshot):
+    return IngredientIndex(
+        (ingredient['id'], ingredient['name'])
+        for ingredient in snapshot.items
+    )
+
+
+def get_ingredient_index():
+    return build_ingredient_index(ingredient_catalog.snapshot())
+
+
+def search_ingredient_ids(query, limit):
+    """
+    id ингредиентов, название которых начинается с query, а за ними
+    тех, что содержат query; не более limit результатов.
+    """
+    if connection.vendor == 'postgresql':
+        return list(Ingredient.objects.filter(
+            name__icontains=query
+        ).annotate(
+            is_contained=Case(
+                When(name__istartswith=query, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        ).order_by(
+            'is_contained', 'name'
+        ).values_list('id', flat=True)[:limit])
+    return get_ingredient_index().search(query, limit)
+
+
+def tokenize(text):
+    """ Слова текста, усечённые до STEM_LENGTH символов. """
+    return [word[:STEM_LENGTH] for word in re.findall(r'\w+', text.lower())]
+
+
+class RecipeIndex:
+    """
+    Обратный индекс рецептов в памяти процесса: слово -> {id: вес}.
+    Используется вместо tsvector, когда база не PostgreSQL; веса полей
+    совпадают с весами A, B, C по умолчанию в PostgreSQL.
+    """
+    WEIGHTS = (1.0, 0.4, 0.2)
+
+    def __init__(self, recipes):
+        self.postings = defaultdict(dict)
+        self.size = 0
+        for pk, *fields in recipes:
+            self.size += 1
+            for weight, value in zip(self.WEIGHTS, fields):
+                for term in tokenize(value):
+                    postings = self.postings[term]
+                    postings[pk] = postings.get(pk, 0) + weight
+
+    def search(self, query, limit):
+        """
+        До limit пар (id, ранг) рецептов, содержащих все слова query,
+        по убыванию ранга.
+        """
+        scores = None
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                return []
+            idf = math.log(1 + self.size / len(postings))
+            if scores is None:
+                scores = {pk: weight * idf for pk, weight in postings.items()}
+            else:
+                scores = {pk: score + postings[pk] * idf
+                          for pk, score in scores.items() if pk in postings}
+        return heapq.nsmallest(
+            limit, (scores or {}).items(),
+            key=lambda item: (-item[1], -item[0])
+        )
+
+
+def build_recipe_index():
+    ingredient_names = defaultdict(list)
+    with primary():
+        for recipe, name in IngredientRecipe.objects.values_list(
+                'recipe', 'ingredient__name').iterator():
+            ingredient_names[recipe].append(name)
+        return RecipeIndex(
+            (pk, name, ' '.join(ingredient_names[pk]), text)
+            for pk, name, text in Recipe.objects.values_list(
+                'pk', 'name', 'text').iterator()
+        )
+
+
+recipe_index = VersionedIndex(
+    build_recipe_index,
+    lambda: get_versions(
+        RECIPES_GENERATION_KEY, ingredient_catalog.version_key)
+)
+
+
+def get_recipe_index():
+    """
+    Индекс для поиска без PostgreSQL. После изменений рецептов до конца
+    фоновой перестройки поиск идёт по прежнему индексу.
+    """
+    return recipe_index.get()
+
+
+def search_recipes(queryset, query):
+    """
+    Рецепты queryset, подходящие под query, с рангом search_rank,
+    от более релевантных к менее.
+    """
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(
+            query, config=settings.RECIPE_SEARCH_CONFIG,
+            search_type='websearch')
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-search_rank', '-id')
+    found = get_recipe_index().search(query, settings.RECIPE_SEARCH_LIMIT)
+    if not found:
+        return queryset.none()
+    ranks = defaultdict(list)
+    for pk, rank in found:
+        ranks[rank].append(pk)
+    return queryset.filter(pk__in=[pk for pk, _ in found]).annotate(
+        search_rank=Case(
+            *(When(pk__in=ids, then=Value(rank))
+              for rank, ids in ranks.items()),
+            output_field=FloatField(),
+        )
+    ).order_by('-search_rank', '-id')
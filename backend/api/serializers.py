@@ -1,7 +1,7 @@
-import base64
-
-from api.utils import add_ingredients
-from django.core.files.base import ContentFile
+from api.images import decode_base64_image, rendition_url
+from api.utils import (add_ingredients, cart_user_ids, update_cart_items,
+                       update_ingredients, update_tags)
+from django.conf import settings
 from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
@@ -11,14 +11,28 @@ from users.models import Subscribe, User
 
 
 class Base64ImageField(serializers.ImageField):
+    def __init__(self, *args, rendition=None, **kwargs):
+        self.rendition = rendition
+        super().__init__(*args, **kwargs)
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = decode_base64_image(data)
+            if isinstance(data, str):
+                return data
 
         return super().to_internal_value(data)
 
+    def to_representation(self, value):
+        rendition = self.context.get('image_rendition', self.rendition)
+        if not value or rendition is None:
+            return super().to_representation(value)
+        url = rendition_url(value, rendition)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
 
 class Us3rSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField(read_only=True)
@@ -35,6 +49,8 @@ class Us3rSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
@@ -68,7 +84,7 @@ class CreateUserSerializer(UserCreateSerializer):
 
 class RecipeSmallSerializer(serializers.ModelSerializer):
     """ Сериализатор для представления """
-    image = Base64ImageField()
+    image = Base64ImageField(rendition='card')
 
     class Meta:
         model = Recipe
@@ -79,9 +95,8 @@ class SubscribeSerializer(serializers.ModelSerializer):
     """ Сериализатор для вывода после подписки """
 
     recipes = RecipeSmallSerializer(read_only=True, many=True)
-    recipes_count = serializers.IntegerField(source='author.recipes.count',
-                                             read_only=True)
-    is_subscribed = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(read_only=True)
+    is_subscribed = serializers.BooleanField(read_only=True)
 
     class Meta:
         model = User
@@ -105,11 +120,25 @@ class SubscribeSerializer(serializers.ModelSerializer):
             'recipes_count'
         )
 
-    def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return obj.subscribing.filter(user=user).exists()
+
+class IngredientMatchQuerySerializer(serializers.Serializer):
+    """ Параметры подбора рецептов по имеющимся ингредиентам """
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+    )
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.INGREDIENT_MATCH_LIMIT,
+        default=settings.INGREDIENT_MATCH_LIMIT,
+    )
+
+
+class RecipeMatchSerializer(serializers.Serializer):
+    """ Рецепт с долей имеющихся ингредиентов и недостающими """
+    recipe = RecipeSmallSerializer()
+    coverage = serializers.FloatField()
+    missing = serializers.ListField(child=serializers.DictField())
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -154,25 +183,35 @@ class ReadOnlyRecipeSerializer(serializers.ModelSerializer):
     ingredients = IngredientRecipeSerializer(
         many=True, source='ingredients_recipes', read_only=True
     )
-    image = Base64ImageField(required=False)
+    image = Base64ImageField(required=False, rendition='detail')
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        exclude = ('pub_date', )
+        exclude = ('pub_date', 'favorites_count', 'trending_score',
+                   'search_vector')
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if request.user.is_anonymous:
             return False
         return obj.favorites.filter(user=request.user).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         return (request and request.user.is_authenticated
                 and obj.carts.filter(user=request.user).exists())
 
+    def to_representation(self, instance):
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        return super().to_representation(instance)
+
 
 class AmountSerializer(serializers.ModelSerializer):
     """  Рецепт количество   """
@@ -195,6 +234,18 @@ class RecipeSerializer(serializers.ModelSerializer):
     )
     image = Base64ImageField()
 
+    def validate_ingredients(self, value):
+        ids = [ingredient['id'] for ingredient in value]
+        duplicates = sorted({pk for pk in ids if ids.count(pk) > 1})
+        if duplicates:
+            raise serializers.ValidationError(
+                f'Ингредиенты повторяются: {duplicates}')
+        missing = sorted(set(ids) - Ingredient.objects.in_bulk(ids).keys())
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты не найдены: {missing}')
+        return value
+
     @transaction.atomic
     def create(self, validated_data):
         request = self.context.get('request')
@@ -207,15 +258,16 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop('ingredients_recipes')
-        tags = validated_data.pop('tags')
-        instance.tags.clear()
-        instance.tags.set(tags)
-        IngredientRecipe.objects.filter(recipe=instance).delete()
-        super().update(instance, validated_data)
-        add_ingredients(ingredients, instance)
-        instance.save()
-        return instance
+        ingredients = validated_data.pop('ingredients_recipes', None)
+        tags = validated_data.pop('tags', None)
+        if tags is not None:
+            update_tags(tags, instance)
+        if ingredients is not None:
+            deltas = update_ingredients(ingredients, instance)
+            update_cart_items(cart_user_ids(instance.id), deltas)
+        if validated_data.get('image') == instance.image.name:
+            validated_data.pop('image')
+        return super().update(instance, validated_data)
 
     def to_representation(self, instance):
         request = self.context.get('request')
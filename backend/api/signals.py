@@ -0,0 +1,189 @@
+import time
+
+from api.cache import invalidate_recipes
+from api.catalog import ingredient_catalog, tag_catalog
+from api.images import schedule_renditions
+from api.metrics import install_query_recorder
+from api.utils import cart_user_ids, recipe_amounts, update_cart_items
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Tag)
+from users.models import User
+
+connection_created.connect(install_query_recorder)
+
+
+def check_connections(**kwargs):
+    """
+    Закрывает перед запросом постоянные соединения, которые разорвал
+    сервер БД или pgbouncer; новое откроется при первом обращении.
+    Проверка - отдельный запрос к базе, поэтому проверяются только
+    соединения, простаивавшие дольше CONN_HEALTH_CHECK_INTERVAL секунд.
+    """
+    now = time.monotonic()
+    for conn in connections.all():
+        settings_dict = conn.settings_dict
+        if (conn.connection is None
+                or settings_dict['CONN_MAX_AGE'] == 0
+                or not settings_dict.get('CONN_HEALTH_CHECKS')):
+            continue
+        idle = now - getattr(conn, 'last_request_started', float('-inf'))
+        conn.last_request_started = now
+        if (idle >= settings_dict.get('CONN_HEALTH_CHECK_INTERVAL', 0)
+                and not conn.is_usable()):
+            conn.close()
+
+
+request_started.connect(check_connections)
+
+for catalog, model in ((tag_catalog, Tag), (ingredient_catalog, Ingredient)):
+    post_save.connect(catalog.invalidate, sender=model)
+    post_delete.connect(catalog.invalidate, sender=model)
+
+
+def create_image_renditions(sender, instance, **kwargs):
+    if instance.image:
+        schedule_renditions(instance.image.name)
+
+
+post_save.connect(create_image_renditions, sender=Recipe)
+
+
+def recipe_changed(sender, instance, **kwargs):
+    invalidate_recipes([instance.pk])
+
+
+def recipe_ingredients_changed(sender, instance, **kwargs):
+    invalidate_recipes([instance.recipe_id])
+
+
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    invalidate_recipes(pk_set or () if reverse else [instance.pk])
+
+
+def author_changed(sender, instance, created, update_fields, **kwargs):
+    if created or (update_fields
+                   and set(update_fields) <= {'last_login', 'password'}):
+        return
+    invalidate_recipes(instance.recipes.values_list('pk', flat=True))
+
+
+post_save.connect(recipe_changed, sender=Recipe)
+post_delete.connect(recipe_changed, sender=Recipe)
+post_save.connect(recipe_ingredients_changed, sender=IngredientRecipe)
+post_delete.connect(recipe_ingredients_changed, sender=IngredientRecipe)
+m2m_changed.connect(recipe_tags_changed, sender=Recipe.tags.through)
+post_save.connect(author_changed, sender=User)
+
+
+def change_counter(model, pk, field, delta):
+    """
+    Атомарно меняет счётчик выражением F(); ниже нуля не опускается.
+    """
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def favorite_saved(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', 1)
+
+
+def favorite_deleted(sender, instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, 'favorites_count', -1)
+
+
+def recipe_saved(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+def recipe_deleted(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+post_save.connect(favorite_saved, sender=Favorite)
+post_delete.connect(favorite_deleted, sender=Favorite)
+post_save.connect(recipe_saved, sender=Recipe)
+post_delete.connect(recipe_deleted, sender=Recipe)
+
+
+def recipe_search_changed(sender, instance, **kwargs):
+    Recipe.objects.filter(pk=instance.pk).update_search_vector()
+
+
+def ingredient_search_changed(sender, instance, created, **kwargs):
+    if not created:
+        Recipe.objects.filter(ingredients=instance).update_search_vector()
+
+
+post_save.connect(recipe_search_changed, sender=Recipe)
+post_save.connect(ingredient_search_changed, sender=Ingredient)
+
+
+def cart_deltas(instance, sign):
+    """
+    Вклад строки корзины или ингредиента рецепта в суммарные корзины:
+    {id пользователя: {id ингредиента: delta}}.
+    """
+    if isinstance(instance, ShoppingCart):
+        user_ids = [instance.user_id]
+        amounts = recipe_amounts(instance.recipe_id)
+    else:
+        user_ids = cart_user_ids(instance.recipe_id)
+        amounts = {instance.ingredient_id: instance.amount}
+    return {
+        user_id: {ingredient: sign * amount
+                  for ingredient, amount in amounts.items()}
+        for user_id in user_ids
+    }
+
+
+def apply_cart_changes(*changes):
+    """
+    Складывает вклады строк по пользователям и применяет их к
+    ShoppingCartItem, группируя пользователей с одинаковыми изменениями.
+    """
+    by_user = {}
+    for change in changes:
+        for user_id, deltas in change.items():
+            merged = by_user.setdefault(user_id, {})
+            for ingredient, delta in deltas.items():
+                merged[ingredient] = merged.get(ingredient, 0) + delta
+    groups = {}
+    for user_id, deltas in by_user.items():
+        groups.setdefault(frozenset(deltas.items()), []).append(user_id)
+    for deltas, user_ids in groups.items():
+        update_cart_items(user_ids, dict(deltas))
+
+
+def cart_row_saving(sender, instance, **kwargs):
+    instance.previous_cart_row = (
+        sender.objects.filter(pk=instance.pk).first() if instance.pk else None)
+
+
+def cart_row_saved(sender, instance, **kwargs):
+    previous, instance.previous_cart_row = instance.previous_cart_row, None
+    apply_cart_changes(
+        cart_deltas(previous, -1) if previous else {},
+        cart_deltas(instance, 1),
+    )
+
+
+def cart_row_deleted(sender, instance, **kwargs):
+    apply_cart_changes(cart_deltas(instance, -1))
+
+
+for model in (ShoppingCart, IngredientRecipe):
+    pre_save.connect(cart_row_saving, sender=model)
+    post_save.connect(cart_row_saved, sender=model)
+    post_delete.connect(cart_row_deleted, sender=model)
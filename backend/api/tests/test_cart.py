@@ -0,0 +1,139 @@
+from io import StringIO
+from unittest import mock
+
+from api.utils import update_cart_items
+from django.core.management import call_command
+from django.test import TestCase
+from recipes.models import (Ingredient, IngredientRecipe, Recipe, ShoppingCart,
+                            ShoppingCartItem)
+from rest_framework.test import APIClient
+from users.models import User
+
+
+class ShoppingCartItemTests(TestCase):
+    """
+    Суммарная корзина ShoppingCartItem совпадает с корзинами при любом
+    способе изменения: через API, админку и каскадные удаления.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username='author', email='author@foodgram.local')
+        cls.buyer = User.objects.create(
+            username='buyer', email='buyer@foodgram.local')
+        cls.ingredients = list(Ingredient.objects.all()[:3])
+        cls.recipes = []
+        for index in range(2):
+            recipe = Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {index}', text='Описание',
+                image='recipes/image/test.jpg', cooking_time=10)
+            IngredientRecipe.objects.bulk_create(
+                IngredientRecipe(recipe=recipe, ingredient=ingredient,
+                                 amount=10 * (index + 1))
+                for ingredient in cls.ingredients[index:index + 2]
+            )
+            cls.recipes.append(recipe)
+
+    def totals(self, user):
+        return dict(user.cart_items.values_list(
+            'ingredient_id', 'total_amount'))
+
+    def assert_consistent(self):
+        call_command('rebuild_shopping_cart', '--verify', stdout=StringIO())
+
+    def fill_carts(self):
+        for user in (self.author, self.buyer):
+            for recipe in self.recipes:
+                ShoppingCart.objects.create(user=user, recipe=recipe)
+
+    def test_api_add_and_remove(self):
+        client = APIClient()
+        client.force_authenticate(self.buyer)
+        for recipe in self.recipes:
+            response = client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+            self.assertEqual(response.status_code, 201, response.content)
+        first, second, third = (ingredient.id
+                                for ingredient in self.ingredients)
+        self.assertEqual(self.totals(self.buyer),
+                         {first: 10, second: 30, third: 20})
+        response = client.delete(
+            f'/api/recipes/{self.recipes[0].id}/shopping_cart/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.totals(self.buyer), {second: 20, third: 20})
+        self.assert_consistent()
+
+    def test_api_recipe_update(self):
+        self.fill_carts()
+        client = APIClient()
+        client.force_authenticate(self.author)
+        recipe = self.recipes[0]
+        response = client.patch(
+            f'/api/recipes/{recipe.id}/',
+            {'ingredients': [
+                {'id': self.ingredients[1].id, 'amount': 5},
+                {'id': self.ingredients[2].id, 'amount': 7},
+            ]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.totals(self.buyer), {
+            self.ingredients[1].id: 25, self.ingredients[2].id: 27})
+        self.assert_consistent()
+
+    def test_cart_rows_edited_directly(self):
+        self.fill_carts()
+        ShoppingCart.objects.get(user=self.buyer,
+                                 recipe=self.recipes[1]).delete()
+        self.assert_consistent()
+        cart = ShoppingCart.objects.get(user=self.buyer,
+                                        recipe=self.recipes[0])
+        cart.recipe = self.recipes[1]
+        cart.save()
+        self.assertEqual(self.totals(self.buyer), {
+            self.ingredients[1].id: 20, self.ingredients[2].id: 20})
+        self.assert_consistent()
+        ShoppingCart.objects.filter(user=self.author).delete()
+        self.assertEqual(self.totals(self.author), {})
+        self.assert_consistent()
+
+    def test_recipe_ingredients_edited_directly(self):
+        self.fill_carts()
+        row = IngredientRecipe.objects.filter(recipe=self.recipes[0]).first()
+        row.amount += 3
+        row.save()
+        self.assert_consistent()
+        row.ingredient = self.ingredients[2]
+        row.save()
+        self.assert_consistent()
+        IngredientRecipe.objects.create(
+            recipe=self.recipes[1], ingredient=self.ingredients[0], amount=4)
+        self.assert_consistent()
+        row.delete()
+        self.assert_consistent()
+
+    def test_cascade_deletes(self):
+        self.fill_carts()
+        self.recipes[0].delete()
+        self.assert_consistent()
+        self.ingredients[2].delete()
+        self.assert_consistent()
+        self.author.delete()
+        self.assertEqual(self.totals(self.buyer), {})
+        self.assert_consistent()
+
+    def test_concurrent_first_add(self):
+        ingredient = self.ingredients[0]
+        ShoppingCartItem.objects.create(
+            user=self.buyer, ingredient=ingredient, total_amount=2)
+        select_for_update = ShoppingCartItem.objects.select_for_update
+
+        def missed_by_first_select(*args, **kwargs):
+            # Строку вставил параллельный запрос уже после чтения корзины.
+            mocked.side_effect = select_for_update
+            return ShoppingCartItem.objects.none()
+
+        with mock.patch.object(ShoppingCartItem.objects, 'select_for_update',
+                               side_effect=missed_by_first_select) as mocked:
+            update_cart_items([self.buyer.id], {ingredient.id: 5})
+        self.assertEqual(self.totals(self.buyer), {ingredient.id: 7})
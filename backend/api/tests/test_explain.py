@@ -0,0 +1,139 @@
+from unittest import skipUnless
+
+from api.filters import RecipeFilter
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from recipes.models import Favorite, Recipe, ShoppingCart, Tag
+from users.models import User
+
+AUTHORS = 20
+RECIPES_PER_AUTHOR = 100
+
+
+class RecipeFilterTestMixin:
+
+    def filtered(self, params):
+        request = RequestFactory().get('/api/recipes/', params)
+        request.user = self.reader
+        return RecipeFilter(
+            params,
+            queryset=Recipe.objects.with_user_flags(self.reader),
+            request=request,
+        ).qs
+
+
+class RecipeFilterTagsTests(RecipeFilterTestMixin, TestCase):
+    """ Фильтр по нескольким тегам не дублирует рецепты. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create(
+            username='reader', email='reader@foodgram.local')
+        author = User.objects.create(
+            username='author', email='author@foodgram.local')
+        cls.tags = list(Tag.objects.all()[:2])
+        for index in range(3):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {index}', text='Описание',
+                image='recipes/image/test.jpg', cooking_time=10)
+            recipe.tags.set(cls.tags)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_multiple_tags_without_duplicates(self):
+        ids = list(self.filtered(
+            {'tags': [tag.slug for tag in self.tags]}
+        ).values_list('id', flat=True))
+        self.assertEqual(len(ids), 3)
+        self.assertEqual(len(ids), len(set(ids)))
+
+
+@skipUnless(connection.vendor == 'postgresql',
+            'Планы выполнения проверяются только на PostgreSQL.')
+class RecipeFilterExplainTests(RecipeFilterTestMixin, TestCase):
+    """
+    Каждый вид фильтра RecipeFilter на заполненной базе использует
+    свой индекс: пропажа индекса из плана означает полный перебор.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create(
+            username='reader', email='reader@foodgram.local')
+        authors = User.objects.bulk_create(
+            User(username=f'author{number}',
+                 email=f'author{number}@foodgram.local')
+            for number in range(AUTHORS)
+        )
+        cls.author = authors[0]
+        recipes = Recipe.objects.bulk_create(
+            Recipe(author=author, name=f'Рецепт {author.pk}-{index}',
+                   text='Описание', image='recipes/image/test.jpg',
+                   cooking_time=10, favorites_count=index % 7,
+                   trending_score=index % 11)
+            for author in authors for index in range(RECIPES_PER_AUTHOR)
+        )
+        tags = list(Tag.objects.all())
+        cls.slugs = [tag.slug for tag in tags[:2]]
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tags[index % len(tags)])
+            for index, recipe in enumerate(recipes)
+        )
+        Favorite.objects.bulk_create(
+            Favorite(user=user, recipe=recipe)
+            for user in authors
+            for recipe in recipes[user.pk % 10::10]
+        )
+        Favorite.objects.bulk_create(
+            Favorite(user=cls.reader, recipe=recipe)
+            for recipe in recipes[::50]
+        )
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=user, recipe=recipe)
+            for user in [cls.reader, *authors]
+            for recipe in recipes[user.pk % 20::40]
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        cache.clear()
+
+    def assert_plan_uses(self, params, *indexes):
+        plan = self.filtered(params)[:6].explain()
+        for index in indexes:
+            self.assertIn(index, plan, f'{params}:\n{plan}')
+
+    def test_feed(self):
+        self.assert_plan_uses(
+            {}, 'recipe_pub_date_id_idx', 'unique_favorite',
+            'unique_recipe_recipe_in_cart')
+
+    def test_author(self):
+        self.assert_plan_uses(
+            {'author': self.author.pk}, 'recipe_author_pub_date_idx')
+
+    def test_tags(self):
+        self.assert_plan_uses({'tags': self.slugs}, 'recipe_pub_date_id_idx')
+
+    def test_favorited(self):
+        self.assert_plan_uses({'is_favorited': 1}, 'unique_favorite')
+
+    def test_in_shopping_cart(self):
+        self.assert_plan_uses(
+            {'is_in_shopping_cart': 1}, 'unique_recipe_recipe_in_cart')
+
+    def test_author_and_tags(self):
+        self.assert_plan_uses(
+            {'author': self.author.pk, 'tags': self.slugs},
+            'recipe_author_pub_date_idx')
+
+    def test_popular(self):
+        self.assert_plan_uses(
+            {'ordering': 'popular'}, 'recipe_favorites_id_idx')
+
+    def test_trending(self):
+        self.assert_plan_uses(
+            {'ordering': 'trending'}, 'recipe_trending_id_idx')
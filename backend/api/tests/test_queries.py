@@ -0,0 +1,90 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Tag)
+from rest_framework.test import APIClient
+from users.models import Subscribe, User
+
+
+class ListQueryCountTests(TestCase):
+    """
+    Количество SQL-запросов списков не зависит от размера страницы:
+    рост означает возврат к N+1.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create(
+            username='reader', email='reader@foodgram.local')
+        tags = list(Tag.objects.all()[:2])
+        ingredients = list(Ingredient.objects.all()[:5])
+        for number in range(4):
+            author = User.objects.create(
+                username=f'author{number}',
+                email=f'author{number}@foodgram.local')
+            Subscribe.objects.create(user=cls.reader, author=author)
+            for index in range(5):
+                recipe = Recipe.objects.create(
+                    author=author, name=f'Рецепт {number}-{index}',
+                    text='Описание', image='recipes/image/test.jpg',
+                    cooking_time=10)
+                recipe.tags.set(tags)
+                IngredientRecipe.objects.bulk_create(
+                    IngredientRecipe(recipe=recipe, ingredient=ingredient,
+                                     amount=index + 1)
+                    for ingredient in ingredients[:3 + index % 3]
+                )
+                Favorite.objects.create(user=cls.reader, recipe=recipe)
+                if index % 2:
+                    ShoppingCart.objects.create(user=cls.reader, recipe=recipe)
+
+    def count_queries(self, client, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(context)
+
+    def assert_constant_queries(self, client, small_url, large_url):
+        expected = self.count_queries(client, small_url)
+        cache.clear()
+        with self.assertNumQueries(expected):
+            response = client.get(large_url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+    def reader_client(self):
+        client = APIClient()
+        client.force_authenticate(self.reader)
+        return client
+
+    def test_recipe_list_anonymous(self):
+        response = self.assert_constant_queries(
+            APIClient(), '/api/recipes/?limit=2', '/api/recipes/?limit=6')
+        self.assertEqual(len(response.json()['results']), 6)
+
+    def test_recipe_list_authenticated(self):
+        response = self.assert_constant_queries(
+            self.reader_client(),
+            '/api/recipes/?limit=2', '/api/recipes/?limit=6')
+        results = response.json()['results']
+        self.assertEqual(len(results), 6)
+        self.assertTrue(all(recipe['is_favorited'] for recipe in results))
+
+    def test_recipe_list_filtered(self):
+        self.assert_constant_queries(
+            self.reader_client(),
+            '/api/recipes/?limit=2&is_favorited=1&is_in_shopping_cart=1',
+            '/api/recipes/?limit=6&is_favorited=1&is_in_shopping_cart=1')
+
+    def test_subscriptions(self):
+        response = self.assert_constant_queries(
+            self.reader_client(),
+            '/api/users/subscriptions/?limit=1&recipes_limit=1',
+            '/api/users/subscriptions/?limit=4&recipes_limit=5')
+        results = response.json()['results']
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(len(author['recipes']) == 5
+                            for author in results))
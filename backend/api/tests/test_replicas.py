@@ -0,0 +1,84 @@
+from api.checks import shared_cache_check
+from api.replicas import ReplicaRouter, pin_key, primary, reading_from
+from django.core.cache import cache
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Recipe
+from rest_framework.test import APIClient
+from users.models import User
+
+REPLICA = 'replica_test'
+
+# Вторая база для проверки маршрутизации: в тестах она зеркало основной
+# и видит её зафиксированные данные через отдельное соединение.
+connections.databases.setdefault(REPLICA, {
+    **connections.databases['default'], 'TEST': {'MIRROR': 'default'}})
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA], REPLICA_PIN_SECONDS=5)
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Безопасные запросы читают из реплики, запись идёт в основную базу,
+    после записи пользователь REPLICA_PIN_SECONDS читает из основной.
+    """
+    databases = {'default', REPLICA}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(
+            username='reader', email='reader@foodgram.local')
+        self.recipe = Recipe.objects.create(
+            author=self.user, name='Рецепт', text='Описание',
+            cooking_time=10)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def request(self, method, url):
+        with CaptureQueriesContext(connections['default']) as default:
+            with CaptureQueriesContext(connections[REPLICA]) as replica:
+                response = getattr(self.client, method)(url)
+        self.assertLess(response.status_code, 400, response.content)
+        return len(default), len(replica)
+
+    def test_router(self):
+        router = ReplicaRouter()
+        with reading_from(REPLICA):
+            self.assertEqual(router.db_for_read(Recipe), REPLICA)
+            self.assertEqual(router.db_for_write(Recipe), 'default')
+            with primary():
+                self.assertIsNone(router.db_for_read(Recipe))
+        self.assertTrue(router.allow_migrate('default', 'recipes'))
+        self.assertFalse(router.allow_migrate(REPLICA, 'recipes'))
+
+    def test_safe_request_reads_replica(self):
+        _, replica = self.request('get', '/api/recipes/')
+        self.assertGreater(replica, 0)
+
+    def test_write_goes_to_primary_and_pins(self):
+        default, replica = self.request(
+            'post', f'/api/recipes/{self.recipe.id}/favorite/')
+        self.assertGreater(default, 0)
+        self.assertEqual(replica, 0)
+        self.assertTrue(cache.get(pin_key(self.user)))
+        _, replica = self.request('get', '/api/recipes/')
+        self.assertEqual(replica, 0)
+
+    def test_pin_expires(self):
+        self.request('post', f'/api/recipes/{self.recipe.id}/favorite/')
+        cache.delete(pin_key(self.user))
+        _, replica = self.request('get', '/api/recipes/')
+        self.assertGreater(replica, 0)
+
+    def test_anonymous_reads_replica(self):
+        self.client.force_authenticate(None)
+        _, replica = self.request('get', '/api/users/')
+        self.assertGreater(replica, 0)
+
+    def test_pin_requires_shared_cache(self):
+        self.assertEqual(
+            [error.id for error in shared_cache_check(None)], ['api.E002'])
+        with override_settings(CACHES={'default': {
+                'BACKEND': 'django_redis.cache.RedisCache',
+                'LOCATION': 'redis://localhost:6379/1'}}):
+            self.assertEqual(shared_cache_check(None), [])
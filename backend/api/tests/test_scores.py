@@ -0,0 +1,65 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import User
+
+
+class TrendingScoreTests(TestCase):
+    """
+    trending_score складывается из добавлений в избранное и корзины,
+    каждое из которых затухает со своим возрастом.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(
+            username='author', email='author@foodgram.local')
+        cls.users = [
+            User.objects.create(username=f'user{number}',
+                                email=f'user{number}@foodgram.local')
+            for number in range(4)
+        ]
+        cls.recipes = {
+            name: Recipe.objects.create(
+                author=author, name=name, text='Описание',
+                image='recipes/image/test.jpg', cooking_time=10)
+            for name in ('fresh', 'old', 'stale')
+        }
+        now = timezone.now()
+        for name, count, age in (('fresh', 2, timedelta(hours=1)),
+                                 ('old', 3, timedelta(hours=48)),
+                                 ('stale', 4, timedelta(days=30))):
+            recipe = cls.recipes[name]
+            for user in cls.users[:count]:
+                Favorite.objects.create(user=user, recipe=recipe)
+                ShoppingCart.objects.create(user=user, recipe=recipe)
+            for model in (Favorite, ShoppingCart):
+                model.objects.filter(recipe=recipe).update(created=now - age)
+        Recipe.objects.filter(pk=cls.recipes['stale'].pk).update(
+            trending_score=1)
+
+    def scores(self):
+        call_command('update_recipe_scores', stdout=StringIO())
+        return dict(Recipe.objects.values_list('name', 'trending_score'))
+
+    def test_recent_interactions_outweigh_old_ones(self):
+        scores = self.scores()
+        self.assertGreater(scores['fresh'], scores['old'])
+        self.assertGreater(scores['old'], 0)
+
+    def test_interactions_outside_window_are_ignored(self):
+        self.assertEqual(self.scores()['stale'], 0)
+
+    def test_old_recipe_with_new_interactions_trends(self):
+        recipe = self.recipes['stale']
+        Recipe.objects.filter(pk=recipe.pk).update(
+            pub_date=timezone.now() - timedelta(days=365))
+        for user in self.users:
+            Favorite.objects.filter(user=user, recipe=recipe).update(
+                created=timezone.now())
+        scores = self.scores()
+        self.assertGreater(scores['stale'], scores['fresh'])
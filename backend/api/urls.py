@@ -1,19 +1,24 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (FavoriteViewSet, IngredientViewSet, RecipeViewSet,
-                    TagViewSet, UserViewSet)
+from .metrics import metrics_view
+from .views import (FavoriteViewSet, RecipeViewSet, UserViewSet,
+                    ingredient_detail, ingredient_list, tag_detail, tag_list)
 
 router_v1 = DefaultRouter()
 
-router_v1.register('tags', TagViewSet, basename='tags')
-router_v1.register('ingredients', IngredientViewSet, basename='ingredients')
 router_v1.register('recipes', RecipeViewSet, basename='recipes')
 router_v1.register('users', UserViewSet, basename='users')
 router_v1.register('favorites', FavoriteViewSet, basename='favorites')
 
 
 urlpatterns = [
+    path('metrics/', metrics_view, name='metrics'),
+    path('tags/', tag_list, name='tags-list'),
+    path('tags/<int:pk>/', tag_detail, name='tags-detail'),
+    path('ingredients/', ingredient_list, name='ingredients-list'),
+    path('ingredients/<int:pk>/', ingredient_detail,
+         name='ingredients-detail'),
     path('', include(router_v1.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
@@ -1,8 +1,10 @@
-from django.shortcuts import get_object_or_404
-from recipes.models import Ingredient, IngredientRecipe
+from django.db import IntegrityError, transaction
+from recipes.models import (IngredientRecipe, Recipe, ShoppingCart,
+                            ShoppingCartItem)
 from rest_framework import response, status
 
 
+@transaction.atomic
 def create_obj(request, serializer_name, instance):
     serializer = serializer_name(
         data={'user': request.user.id, 'recipe': instance.id, },
@@ -13,6 +15,7 @@ def create_obj(request, serializer_name, instance):
     return response.Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+@transaction.atomic
 def delete_obj(request, model_name, instance, err_msg):
     if not model_name.objects.filter(user=request.user,
                                      recipe=instance).exists():
@@ -27,16 +30,116 @@ def delete_obj(request, model_name, instance, err_msg):
 
 
 def add_ingredients(ingredients, recipe):
-    ingredient_list = []
-    for ingredient in ingredients:
-        current_ingredient = get_object_or_404(
-            Ingredient, id=ingredient.get('id'))
-        amount = ingredient.get('amount')
-        ingredient_list.append(
-            IngredientRecipe(
-                recipe=recipe,
-                ingredient=current_ingredient,
-                amount=amount
-            )
+    IngredientRecipe.objects.bulk_create(
+        IngredientRecipe(
+            recipe=recipe,
+            ingredient_id=ingredient.get('id'),
+            amount=ingredient.get('amount')
         )
-    IngredientRecipe.objects.bulk_create(ingredient_list)
+        for ingredient in ingredients
+    )
+    Recipe.objects.filter(pk=recipe.pk).update_search_vector()
+
+
+def update_ingredients(ingredients, recipe):
+    """
+    Приводит ингредиенты рецепта к новому списку, меняя только
+    отличающиеся строки. Возвращает изменения количеств
+    {id ингредиента: delta} для добавленных и изменённых строк: их пишут
+    bulk-операции без сигналов, а удаления учитывает post_delete.
+    """
+    amounts = {
+        ingredient.get('id'): ingredient.get('amount')
+        for ingredient in ingredients
+    }
+    current = {row.ingredient_id: row
+               for row in recipe.ingredients_recipes.all()}
+    deltas, to_update, to_delete = {}, [], []
+    for ingredient_id, row in current.items():
+        amount = amounts.get(ingredient_id)
+        if amount is None:
+            to_delete.append(row.id)
+        elif amount != row.amount:
+            deltas[ingredient_id] = amount - row.amount
+            row.amount = amount
+            to_update.append(row)
+    to_create = [
+        {'id': ingredient_id, 'amount': amount}
+        for ingredient_id, amount in amounts.items()
+        if ingredient_id not in current
+    ]
+    deltas.update(
+        (ingredient['id'], ingredient['amount']) for ingredient in to_create)
+    IngredientRecipe.objects.filter(id__in=to_delete).delete()
+    IngredientRecipe.objects.bulk_update(to_update, ['amount'])
+    add_ingredients(to_create, recipe)
+    return deltas
+
+
+def update_tags(tags, recipe):
+    """ Добавляет и удаляет только изменившиеся теги рецепта. """
+    current = set(recipe.tags.values_list('id', flat=True))
+    new = {tag.id for tag in tags}
+    if current - new:
+        recipe.tags.remove(*(current - new))
+    if new - current:
+        recipe.tags.add(*(new - current))
+
+
+def recipe_amounts(recipe_id):
+    """ Количество каждого ингредиента рецепта: {id ингредиента: amount}. """
+    return dict(IngredientRecipe.objects.filter(
+        recipe_id=recipe_id).values_list('ingredient_id', 'amount'))
+
+
+def cart_user_ids(recipe_id):
+    """ Пользователи, у которых рецепт лежит в корзине. """
+    return list(ShoppingCart.objects.filter(
+        recipe_id=recipe_id).values_list('user_id', flat=True))
+
+
+def update_cart_items(user_ids, deltas):
+    """
+    Применяет изменения количеств ингредиентов {id ингредиента: delta}
+    к суммарной корзине каждого из пользователей.
+    """
+    deltas = {ingredient: delta
+              for ingredient, delta in deltas.items() if delta}
+    if not user_ids or not deltas:
+        return
+    try:
+        with transaction.atomic():
+            apply_cart_deltas(user_ids, deltas)
+    except IntegrityError:
+        # Параллельный запрос успел создать ту же строку корзины. Теперь
+        # она видна select_for_update, и повтор прибавит к ней delta.
+        with transaction.atomic():
+            apply_cart_deltas(user_ids, deltas)
+
+
+def apply_cart_deltas(user_ids, deltas):
+    items = {
+        (item.user_id, item.ingredient_id): item
+        for item in ShoppingCartItem.objects.select_for_update().filter(
+            user_id__in=user_ids, ingredient_id__in=deltas)
+    }
+    to_create, to_update, to_delete = [], [], []
+    for user_id in user_ids:
+        for ingredient_id, delta in deltas.items():
+            item = items.get((user_id, ingredient_id))
+            if item is None:
+                if delta > 0:
+                    to_create.append(ShoppingCartItem(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        total_amount=delta
+                    ))
+                continue
+            item.total_amount += delta
+            if item.total_amount > 0:
+                to_update.append(item)
+            else:
+                to_delete.append(item.id)
+    ShoppingCartItem.objects.bulk_create(to_create)
+    ShoppingCartItem.objects.bulk_update(to_update, ['total_amount'])
+    ShoppingCartItem.objects.filter(id__in=to_delete).delete()
@@ -1,10 +1,25 @@
 from api import filters
 from api import serializers as api_serializers
-from api.pagination import RecipePagination
+from api.cache import (cached_response, recipe_detail_cache_key,
+                       recipe_list_cache_key, recipe_payloads)
+from api.catalog import (catalog_response, catalog_view, ingredient_catalog,
+                         tag_catalog)
+from api.exports import SHOPPING_LIST_EXPORTERS, shopping_list_rows
+from api.matching import get_ingredient_matcher
+from api.pagination import (OptionalCursorPaginationMixin, RecipePagination,
+                            SubscriptionCursorPagination)
 from api.permissions import IsAdminOrAuthor
+from api.renderers import CSVRenderer, PDFRenderer, TextRenderer
+from api.replicas import ReplicaReadMixin, replica
+from api.search import search_ingredient_ids
 from api.utils import create_obj, delete_obj
-from django.db.models import Sum
-from django.shortcuts import HttpResponse, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import (BooleanField, Exists, OuterRef, Prefetch,
+                              Subquery, Value)
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser import views
 from recipes import models as recipes_models
@@ -13,11 +28,41 @@ from rest_framework.decorators import action
 from users.models import Subscribe, User
 
 
-class UserViewSet(views.UserViewSet):
+class UserViewSet(ReplicaReadMixin, OptionalCursorPaginationMixin,
+                  views.UserViewSet):
     """ Вьюсет для работы с пользователями и подписками """
     queryset = User.objects.all()
     serializer_class = api_serializers.Us3rSerializer
     pagination_class = RecipePagination
+    cursor_pagination_class = SubscriptionCursorPagination
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.is_anonymous:
+            return super().get_queryset().annotate(
+                is_subscribed=Value(False, output_field=BooleanField()))
+        return super().get_queryset().annotate(
+            is_subscribed=Exists(Subscribe.objects.filter(
+                user=user, author=OuterRef('pk'))))
+
+    def get_subscriptions_queryset(self, queryset):
+        """
+        Авторы с не более recipes_limit последними рецептами каждого,
+        отобранными в базе данных; количество рецептов хранится в User.
+        """
+        recipes = recipes_models.Recipe.objects.all()
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if recipes_limit and recipes_limit.isdigit():
+            recipes = recipes.filter(pk__in=Subquery(
+                recipes_models.Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).order_by('-pub_date').values('pk')[:int(recipes_limit)]
+            ))
+        return queryset.annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes)
+        ).order_by('username')
 
     @action(
         detail=True, methods=['post', 'delete'],
@@ -25,7 +70,10 @@ class UserViewSet(views.UserViewSet):
     def subscribe(self, request, **kwargs):
         user = request.user
         author_id = self.kwargs.get('id')
-        author = get_object_or_404(User, id=author_id)
+        author = get_object_or_404(
+            self.get_subscriptions_queryset(User.objects.all()),
+            id=author_id
+        )
         if request.method == 'POST' and user.is_authenticated:
             if Subscribe.objects.filter(user=user, author=author).exists():
                 return response.Response(
@@ -58,7 +106,9 @@ class UserViewSet(views.UserViewSet):
     )
     def subscriptions(self, request):
         user = request.user
-        queryset = User.objects.filter(subscribing__user=user)
+        queryset = self.get_subscriptions_queryset(
+            User.objects.filter(subscribing__user=user)
+        )
         pages = self.paginate_queryset(queryset)
         serializer = api_serializers.SubscribeSerializer(
             pages,
@@ -68,35 +118,57 @@ class UserViewSet(views.UserViewSet):
         return self.get_paginated_response(serializer.data)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
-    """
-    Вьюсет для тегов
-    Доступен всем только для чтения.
-    """
-    queryset = recipes_models.Tag.objects.all()
-    serializer_class = api_serializers.TagSerializer
-    permission_classes = (permissions.AllowAny, )
+@catalog_view
+async def tag_list(request):
+    """ Список тегов, доступен всем. """
+    snapshot = await sync_to_async(tag_catalog.snapshot)()
+    return catalog_response(request, snapshot)
+
+
+@catalog_view
+async def tag_detail(request, pk):
+    snapshot = await sync_to_async(tag_catalog.snapshot)()
+    tag = snapshot.get(pk)
+    if tag is None:
+        raise Http404
+    return catalog_response(request, snapshot, tag)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
-    """
-    Вьюсет для отображения ингредиентов.
-    Доступен всем только для чтения.
-    """
-    queryset = recipes_models.Ingredient.objects.all()
-    serializer_class = api_serializers.IngredientSerializer
-    permission_classes = (permissions.AllowAny, )
-    filter_backends = (filters.IngredientSearchFilter, )
-    search_fields = ('^name', )
+def find_ingredients(query):
+    """ Снимок справочника и ингредиенты, подходящие под query. """
+    snapshot = ingredient_catalog.snapshot()
+    if not query:
+        return snapshot, None
+    with replica():
+        ids = search_ingredient_ids(query, settings.INGREDIENT_SEARCH_LIMIT)
+    return snapshot, [snapshot.by_id[pk] for pk in ids if pk in snapshot.by_id]
 
 
-class FavoriteViewSet(viewsets.ModelViewSet):
+@catalog_view
+async def ingredient_list(request):
+    """ Список ингредиентов с поиском по параметру name, доступен всем. """
+    snapshot, ingredients = await sync_to_async(find_ingredients)(
+        request.GET.get('name', '').strip())
+    return catalog_response(request, snapshot, ingredients)
+
+
+@catalog_view
+async def ingredient_detail(request, pk):
+    snapshot = await sync_to_async(ingredient_catalog.snapshot)()
+    ingredient = snapshot.get(pk)
+    if ingredient is None:
+        raise Http404
+    return catalog_response(request, snapshot, ingredient)
+
+
+class FavoriteViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """ Вьюсет для избраного """
     queryset = recipes_models.Favorite.objects.all()
     serializer_class = api_serializers.FavoriteSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ReplicaReadMixin, OptionalCursorPaginationMixin,
+                    viewsets.ModelViewSet):
     """ Вьюсет для рецептов """
     queryset = recipes_models.Recipe.objects.all()
     permission_classes = (IsAdminOrAuthor, )
@@ -105,6 +177,50 @@ class RecipeViewSet(viewsets.ModelViewSet):
     pagination_class = RecipePagination
     http_method_names = ['get', 'post', 'patch', 'delete']
 
+    def get_queryset(self):
+        return self.queryset.with_user_flags(
+            self.request.user).defer('search_vector')
+
+    def get_payloads(self, recipes):
+        """ Тела рецептов из кеша с флагами текущего пользователя. """
+        def build(ids):
+            return self.get_serializer(
+                self.queryset.filter(id__in=ids).with_read_payload(
+                    self.request.user).defer('search_vector'),
+                many=True
+            ).data
+
+        return recipe_payloads(self.request, recipes, self.action, build)
+
+    def build_list(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return response.Response(self.get_payloads(list(queryset)))
+        return self.get_paginated_response(self.get_payloads(page))
+
+    def build_retrieve(self):
+        return response.Response(self.get_payloads([self.get_object()])[0])
+
+    def list(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return self.build_list()
+        return cached_response(recipe_list_cache_key(request), self.build_list)
+
+    def retrieve(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return self.build_retrieve()
+        return cached_response(
+            recipe_detail_cache_key(request, kwargs['pk']),
+            self.build_retrieve
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == 'list':
+            context['image_rendition'] = 'card'
+        return context
+
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
             return api_serializers.ReadOnlyRecipeSerializer
@@ -138,29 +254,58 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return delete_obj(
             request, recipes_models.ShoppingCart, recipe, err_msg)
 
+    @action(detail=False, methods=['get'])
+    def match(self, request):
+        """
+        Рецепты, которые можно приготовить из переданных ингредиентов,
+        по убыванию доли имеющихся ингредиентов.
+        """
+        query = api_serializers.IngredientMatchQuerySerializer(data={
+            'ingredients': request.query_params.getlist('ingredients'),
+            'limit': request.query_params.get(
+                'limit', settings.INGREDIENT_MATCH_LIMIT),
+        })
+        query.is_valid(raise_exception=True)
+        matches = get_ingredient_matcher().match(
+            query.validated_data['ingredients'],
+            query.validated_data['limit']
+        )
+        recipes = recipes_models.Recipe.objects.defer(
+            'search_vector').in_bulk([recipe for recipe, _, _ in matches])
+        ingredients = ingredient_catalog.snapshot()
+        serializer = api_serializers.RecipeMatchSerializer(
+            [
+                {
+                    'recipe': recipes[recipe],
+                    'coverage': round(coverage, 4),
+                    'missing': [ingredients.get(pk) for pk in missing],
+                }
+                for recipe, coverage, missing in matches
+                if recipe in recipes
+            ],
+            many=True,
+            context=self.get_serializer_context()
+        )
+        return response.Response(serializer.data)
+
     @action(
         detail=False,
         methods=['get'],
-        permission_classes=[permissions.IsAuthenticated, ]
+        permission_classes=[permissions.IsAuthenticated, ],
+        renderer_classes=[TextRenderer, CSVRenderer, PDFRenderer]
     )
     def download_shopping_cart(self, request):
-        ingredients = recipes_models.IngredientRecipe.objects.filter(
-            recipe__carts__user=request.user
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(
-            ingredient_amount=Sum('amount')
-        ).order_by(
-            'ingredient__name'
+        renderer = request.accepted_renderer
+        export_format = renderer.format
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f'; charset={renderer.charset}'
+        rows = shopping_list_rows(
+            request.user, buffered=isinstance(request._request, ASGIRequest))
+        response = StreamingHttpResponse(
+            SHOPPING_LIST_EXPORTERS[export_format](rows),
+            content_type=content_type
         )
-        shopping_list = ['Список покупок:\n']
-        for ingredient in ingredients:
-            name = ingredient['ingredient__name']
-            amount = ingredient['ingredient_amount']
-            unit = ingredient['ingredient__measurement_unit']
-            shopping_list.append(f'\n{name} - {amount} {unit}')
-        filename = 'shopping_cart.txt'
-        response = HttpResponse(shopping_list, content_type='text/plain')
+        filename = f'shopping_cart.{export_format}'
         response['Content-Disposition'] = f'attachment; filename={filename}'
         return response
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -91,10 +92,71 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', default='postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='postgres'),
         'HOST': os.getenv('DB_HOST', default='db'),
-        'PORT': os.getenv('DB_PORT', default='5432')
+        'PORT': os.getenv('DB_PORT', default='5432'),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=0)),
+        'CONN_HEALTH_CHECKS': os.getenv(
+            'DB_CONN_HEALTH_CHECKS', default='1') == '1',
+        'CONN_HEALTH_CHECK_INTERVAL': int(os.getenv(
+            'DB_CONN_HEALTH_CHECK_INTERVAL', default=10)),
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv(
+            'DB_DISABLE_SERVER_SIDE_CURSORS', default='0') == '1',
     }
 }
 
+# Реплики для чтения: хосты через запятую, для SQLite - пути к файлам баз.
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', default='').split(','))):
+    alias = f'replica_{number}'
+    DATABASES[alias] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    if DATABASES[alias]['ENGINE'].endswith('sqlite3'):
+        DATABASES[alias]['NAME'] = replica.strip()
+    else:
+        DATABASES[alias]['HOST'] = replica.strip()
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+
+# Сколько секунд после изменения данных пользователь читает из основной базы.
+REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', default=5))
+
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    }
+}
+
+RECIPE_CACHE_TIMEOUT = int(os.getenv('RECIPE_CACHE_TIMEOUT', default=300))
+
+CATALOG_SNAPSHOT_TIMEOUT = int(
+    os.getenv('CATALOG_SNAPSHOT_TIMEOUT', default=60))
+
+TRENDING_GRAVITY = float(os.getenv('TRENDING_GRAVITY', default=1.5))
+
+# Добавления в избранное и корзины старше окна не влияют на рейтинг в тренде.
+TRENDING_WINDOW_HOURS = int(os.getenv('TRENDING_WINDOW_HOURS', default=168))
+
+SCORE_BATCH_SIZE = int(os.getenv('SCORE_BATCH_SIZE', default=1000))
+
+RECIPE_SEARCH_CONFIG = os.getenv('RECIPE_SEARCH_CONFIG', default='russian')
+
+RECIPE_SEARCH_LIMIT = int(os.getenv('RECIPE_SEARCH_LIMIT', default=1000))
+
+INGREDIENT_MATCH_LIMIT = int(os.getenv('INGREDIENT_MATCH_LIMIT', default=20))
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', default='1') == '1'
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', default='')
+
+METRICS_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', default=500))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/1.11/ref/settings/#auth-password-validators
@@ -138,6 +200,12 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', default=2))
+IMAGE_RENDITIONS = {
+    'card': (480, 480),
+    'detail': (1200, 1200),
+}
+
 
 AUTH_USER_MODEL = 'users.User'
 
@@ -173,6 +241,13 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', default=20))
+
+SHOPPING_LIST_FONT = os.getenv(
+    'SHOPPING_LIST_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
 MIN_AMOUNT_ING = 'Минимальное количество ингридиентов'
 MIN_COOK_TIME = 'Минимальное время приготовления - одна минута.'
 MAX_COOK_TIME = 'Время приготовления блюда - не более 75 часов.'
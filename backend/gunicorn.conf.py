@@ -0,0 +1,18 @@
+"""
+Настройки gunicorn из переменных окружения. Режим WSGI (по умолчанию):
+    gunicorn -c gunicorn.conf.py foodgram.wsgi:application
+Режим ASGI: GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker и
+    gunicorn -c gunicorn.conf.py foodgram.asgi:application
+"""
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 0))
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None
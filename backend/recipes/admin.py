@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.utils.safestring import mark_safe
 
 from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                     ShoppingCart, Tag)
+                     ShoppingCart, ShoppingCartItem, Tag)
 
 admin.site.site_header = 'Администрирование Foodgram'
 admin.site.index_title = 'Панель администратора Foodgram'
@@ -57,9 +57,13 @@ class RecipeAdmin(admin.ModelAdmin):
     readonly_fields = ('in_favorites_amount', )
     empty_value_display = '-пусто-'
 
-    @admin.display(description='в избраном')
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        Recipe.objects.filter(pk=form.instance.pk).update_search_vector()
+
+    @admin.display(description='в избраном', ordering='favorites_count')
     def in_favorites_amount(self, object):
-        return object.favorites.count()
+        return object.favorites_count
 
     @admin.display(description='Миниатюра')
     def get_image(self, object):
@@ -99,3 +103,23 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('pk', 'user', 'recipe')
     search_fields = ('user', 'recipe')
     empty_value_display = '-пусто-'
+
+
+@admin.register(ShoppingCartItem)
+class ShoppingCartItemAdmin(admin.ModelAdmin):
+    """
+    Суммы считаются из корзин и ингредиентов рецептов, поэтому только
+    для просмотра; исправляются командой rebuild_shopping_cart.
+    """
+    list_display = ('pk', 'user', 'ingredient', 'total_amount')
+    search_fields = ('user', 'ingredient')
+    empty_value_display = '-пусто-'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
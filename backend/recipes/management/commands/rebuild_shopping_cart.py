@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+from recipes.models import IngredientRecipe, ShoppingCartItem
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает суммарные корзины покупок (ShoppingCartItem) '
+            'и сверяет их с группировкой по IngredientRecipe.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сверить данные, ничего не изменяя.',
+        )
+
+    def handle(self, *args, **options):
+        expected = {
+            (user, ingredient): total
+            for user, ingredient, total in IngredientRecipe.objects.filter(
+                recipe__carts__isnull=False
+            ).values_list(
+                'recipe__carts__user', 'ingredient'
+            ).annotate(total=Sum('amount')).order_by().iterator()
+        }
+        items = ShoppingCartItem.objects.values_list(
+            'user', 'ingredient', 'total_amount')
+        actual = {
+            (user, ingredient): total
+            for user, ingredient, total in items.iterator()
+        }
+        mismatches = {
+            key for key in expected.keys() | actual.keys()
+            if expected.get(key) != actual.get(key)
+        }
+        for user, ingredient in sorted(mismatches):
+            self.stdout.write(
+                f'user={user} ingredient={ingredient}: '
+                f'ожидается {expected.get((user, ingredient))}, '
+                f'в корзине {actual.get((user, ingredient))}'
+            )
+        if options['verify']:
+            if mismatches:
+                raise CommandError(f'Расхождений: {len(mismatches)}')
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+            return
+        with transaction.atomic():
+            ShoppingCartItem.objects.all().delete()
+            ShoppingCartItem.objects.bulk_create(
+                (ShoppingCartItem(user_id=user, ingredient_id=ingredient,
+                                  total_amount=total)
+                 for (user, ingredient), total in expected.items()),
+                batch_size=1000
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Корзины пересобраны: {len(expected)} строк, '
+            f'исправлено расхождений: {len(mismatches)}'
+        ))
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from recipes.models import Favorite, Recipe
+from users.models import User
+
+
+def count_subquery(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+COUNTERS = (
+    (Recipe, 'favorites_count', count_subquery(Favorite, 'recipe')),
+    (User, 'recipes_count', count_subquery(Recipe, 'author')),
+)
+
+
+class Command(BaseCommand):
+    help = ('Сверяет денормализованные счётчики favorites_count и '
+            'recipes_count с данными и исправляет расхождения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сверить данные, ничего не изменяя.',
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        with transaction.atomic():
+            for model, field, expected in COUNTERS:
+                drifted = model.objects.annotate(
+                    expected=expected
+                ).filter(~Q(**{field: expected}))
+                rows = list(drifted.values_list('pk', field, 'expected'))
+                for pk, actual, value in rows:
+                    self.stdout.write(
+                        f'{model._meta.label} id={pk} {field}: '
+                        f'ожидается {value}, сохранено {actual}'
+                    )
+                if rows and not options['verify']:
+                    model.objects.filter(
+                        pk__in=[pk for pk, _, _ in rows]
+                    ).update(**{field: expected})
+                total += len(rows)
+        if options['verify']:
+            if total:
+                raise CommandError(f'Расхождений: {total}')
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено расхождений: {total}'))
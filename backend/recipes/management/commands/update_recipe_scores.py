@@ -0,0 +1,67 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+
+def interaction_weight(created, now):
+    """ Вес добавления в избранное или корзину по его возрасту в часах. """
+    hours = max((now - created).total_seconds() / 3600, 0)
+    return 1 / (hours + 2) ** settings.TRENDING_GRAVITY
+
+
+def trending_scores(now):
+    """
+    Сумма весов добавлений в избранное и корзины за последние
+    TRENDING_WINDOW_HOURS: {id рецепта: рейтинг}. Старые добавления в
+    окно не попадают, поэтому читается только недавняя активность.
+    """
+    since = now - timedelta(hours=settings.TRENDING_WINDOW_HOURS)
+    scores = defaultdict(float)
+    for model in (Favorite, ShoppingCart):
+        interactions = model.objects.filter(
+            created__gte=since
+        ).values_list('recipe', 'created').order_by()
+        for recipe, created in interactions.iterator():
+            scores[recipe] += interaction_weight(created, now)
+    return scores
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает trending_score рецептов порциями по '
+            'возрастанию id.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.SCORE_BATCH_SIZE,
+            help='Количество рецептов в одной порции.',
+        )
+
+    def handle(self, *args, **options):
+        scores = trending_scores(timezone.now())
+        last_id = 0
+        total = 0
+        while True:
+            chunk = list(Recipe.objects.filter(
+                pk__gt=last_id
+            ).order_by('pk').values_list(
+                'pk', 'trending_score'
+            )[:options['batch_size']])
+            if not chunk:
+                break
+            with transaction.atomic():
+                Recipe.objects.bulk_update(
+                    [Recipe(pk=pk, trending_score=scores.get(pk, 0))
+                     for pk, score in chunk if score or scores.get(pk)],
+                    ['trending_score']
+                )
+            last_id = chunk[-1][0]
+            total += len(chunk)
+        self.stdout.write(self.style.SUCCESS(
+            f'Рейтинг пересчитан для {total} рецептов'))
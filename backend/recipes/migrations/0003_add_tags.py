@@ -11,15 +11,12 @@ INITIAL_TAGS = [
 
 def add_tags(apps, schema_editor):
     Tag = apps.get_model('recipes', 'Tag')
-    for tag in INITIAL_TAGS:
-        new_tag = Tag(**tag)
-        new_tag.save()
+    Tag.objects.bulk_create(Tag(**tag) for tag in INITIAL_TAGS)
 
 
 def remove_tags(apps, schema_editor):
     Tag = apps.get_model('recipes', 'Tag')
-    for tag in INITIAL_TAGS:
-        Tag.objects.get(name=tag['name']).delete()
+    Tag.objects.filter(slug__in=[tag['slug'] for tag in INITIAL_TAGS]).delete()
 
 
 class Migration(migrations.Migration):
@@ -0,0 +1,54 @@
+# Generated by Django 3.2.18 on 2026-10-18 21:40
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector '
+        'ON recipes_recipe USING gin (search_vector)'
+    )
+    schema_editor.execute(
+        '''
+        UPDATE recipes_recipe AS recipe SET search_vector =
+            setweight(to_tsvector(%(config)s::regconfig,
+                                  COALESCE(recipe.name, '')), 'A')
+            || setweight(to_tsvector(%(config)s::regconfig, COALESCE((
+                SELECT string_agg(ingredient.name, ' ')
+                FROM recipes_ingredientrecipe AS amount
+                JOIN recipes_ingredient AS ingredient
+                    ON ingredient.id = amount.ingredient_id
+                WHERE amount.recipe_id = recipe.id
+            ), '')), 'B')
+            || setweight(to_tsvector(%(config)s::regconfig,
+                                     COALESCE(recipe.text, '')), 'C')
+        ''',
+        {'config': settings.RECIPE_SEARCH_CONFIG}
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'DROP INDEX IF EXISTS recipes_recipe_search_vector')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_scores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.2.18 on 2026-10-18 22:05
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_created(apps, schema_editor):
+    """
+    Настоящее время добавления старых строк неизвестно. Берётся дата
+    публикации рецепта, как раньше считался рейтинг в тренде.
+    """
+    Recipe = apps.get_model('recipes', 'Recipe')
+    for name in ('Favorite', 'ShoppingCart'):
+        apps.get_model('recipes', name).objects.update(created=Subquery(
+            Recipe.objects.filter(pk=OuterRef('recipe')).values('pub_date')
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_drop_redundant_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='favorite',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_created, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,11 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import connections, models
+from django.db.models import (BooleanField, Exists, OuterRef, Prefetch,
+                              Subquery, Value)
 from foodgram import settings
-from users.models import User
+from users.models import Subscribe, User
 
 
 class Tag(models.Model):
@@ -51,6 +55,75 @@ class Ingredient(models.Model):
         return self.name
 
 
+RECIPE_ORDERINGS = {
+    'new': ('-pub_date', '-id'),
+    'popular': ('-favorites_count', '-id'),
+    'trending': ('-trending_score', '-id'),
+}
+
+
+class RecipeQuerySet(models.QuerySet):
+    """ Набор запросов для рецептов """
+
+    def with_user_flags(self, user):
+        """
+        Добавляет флаги is_favorited, is_in_shopping_cart и
+        author_is_subscribed для текущего пользователя одним запросом.
+        """
+        if user.is_anonymous:
+            false = Value(False, output_field=BooleanField())
+            return self.annotate(
+                is_favorited=false,
+                is_in_shopping_cart=false,
+                author_is_subscribed=false,
+            )
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            author_is_subscribed=Exists(Subscribe.objects.filter(
+                user=user, author=OuterRef('author'))),
+        )
+
+    def with_read_payload(self, user):
+        """
+        Подгружает автора, теги и ингредиенты рецептов фиксированным
+        числом запросов независимо от размера страницы.
+        """
+        return self.with_user_flags(user).select_related(
+            'author'
+        ).prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.all()),
+            Prefetch(
+                'ingredients_recipes',
+                queryset=IngredientRecipe.objects.select_related(
+                    'ingredient')
+            ),
+        )
+
+    def update_search_vector(self):
+        """
+        Пересчитывает search_vector по названию, ингредиентам и тексту.
+        Поле используется только в PostgreSQL, в остальных базах
+        ничего не делает.
+        """
+        if connections[self.db].vendor != 'postgresql':
+            return 0
+        ingredient_names = IngredientRecipe.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+        config = settings.RECIPE_SEARCH_CONFIG
+        return self.update(search_vector=(
+            SearchVector('name', weight='A', config=config)
+            + SearchVector(Subquery(ingredient_names), weight='B',
+                           config=config)
+            + SearchVector('text', weight='C', config=config)
+        ))
+
+
 class Recipe(models.Model):
     """ Модель для рецептов """
     author = models.ForeignKey(
@@ -95,14 +168,48 @@ class Recipe(models.Model):
     )
     pub_date = models.DateTimeField(
         auto_now_add=True,
-        db_index=True,
         verbose_name='Дата публикации',
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False,
+    )
+    trending_score = models.FloatField(
+        verbose_name='Рейтинг популярности за последнее время',
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='recipe_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['-favorites_count', '-id'],
+                name='recipe_favorites_id_idx'
+            ),
+            models.Index(
+                fields=['-trending_score', '-id'],
+                name='recipe_trending_id_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -151,6 +258,7 @@ class Favorite(models.Model):
     user = models.ForeignKey(
         to=User,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='favorites',
         verbose_name='Пользователь',
     )
@@ -160,6 +268,11 @@ class Favorite(models.Model):
         related_name='favorites',
         verbose_name='Рецепт в избранном',
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата добавления',
+    )
 
     class Meta:
         ordering = ('id', )
@@ -181,6 +294,7 @@ class ShoppingCart(models.Model):
     user = models.ForeignKey(
         to=User,
         on_delete=models.CASCADE,
+        db_index=False,
         related_name='carts',
         verbose_name='Пользователь'
     )
@@ -190,6 +304,11 @@ class ShoppingCart(models.Model):
         related_name='carts',
         verbose_name='Рецепт'
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата добавления',
+    )
 
     class Meta:
         ordering = ('-id', )
@@ -204,3 +323,36 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user} добавил в корзину {self.recipe}'
+
+
+class ShoppingCartItem(models.Model):
+    """ Модель для суммарного количества ингредиента в корзине """
+    user = models.ForeignKey(
+        to=User,
+        on_delete=models.CASCADE,
+        related_name='cart_items',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        to=Ingredient,
+        on_delete=models.CASCADE,
+        related_name='cart_items',
+        verbose_name='Ингридиент'
+    )
+    total_amount = models.PositiveIntegerField(
+        verbose_name='Суммарное количество'
+    )
+
+    class Meta:
+        ordering = ('id', )
+        verbose_name = 'Сумма ингридиента в корзине'
+        verbose_name_plural = 'Суммы ингридиентов в корзине'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_cart_item'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} - {self.total_amount}'
@@ -12,6 +12,7 @@ class UserAdmin(BaseUserAdmin):
         'email',
         'first_name',
         'last_name',
+        'recipes_count',
     )
     fields = (
         'email',
@@ -19,13 +20,14 @@ class UserAdmin(BaseUserAdmin):
         'username',
         'first_name',
         'last_name',
-        ('last_login', 'date_joined',)
+        ('last_login', 'date_joined',),
+        'recipes_count',
     )
     fieldsets = []
     search_fields = ('username', 'email',)
     list_filter = ('username', 'email',)
     ordering = ('username', )
-    readonly_fields = ('last_login', 'date_joined',)
+    readonly_fields = ('last_login', 'date_joined', 'recipes_count')
     empty_value_display = '-пусто-'
 
 
@@ -1,25 +1,34 @@
 # Generated by Django 3.2.18 on 2023-05-01 23:36
 
 import json
+import os
 
 from django.db import migrations
 
-with open('../../data/ingredients.json', 'r', encoding="utf-8") as file:
-    INITIAL_INGREDIENTS = json.loads(file.read())
+DATA_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'backend', 'data', 'ingredients.json'
+)
 
 
-def add_ingredients(apps, schema_editor):
+def read_ingredients():
+    with open(DATA_PATH, encoding='utf-8') as file:
+        return json.load(file)
+
 
+def add_ingredients(apps, schema_editor):
     Ingredient = apps.get_model('recipes', 'Ingredient')
-    for ingredient in INITIAL_INGREDIENTS:
-        new_ingredient = Ingredient(**ingredient)
-        new_ingredient.save()
+    Ingredient.objects.bulk_create(
+        (Ingredient(**ingredient) for ingredient in read_ingredients()),
+        batch_size=1000
+    )
 
 
 def remove_ingredients(apps, schema_editor):
     Ingredient = apps.get_model('recipes', 'Ingredient')
-    for ingredient in INITIAL_INGREDIENTS:
-        Ingredient.objects.get(name=ingredient['name']).delete()
+    names = [ingredient['name'] for ingredient in read_ingredients()]
+    for start in range(0, len(names), 500):
+        Ingredient.objects.filter(name__in=names[start:start + 500]).delete()
 
 
 class Migration(migrations.Migration):